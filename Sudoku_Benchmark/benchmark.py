@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( HERE, "..", "Sudoku_Python_Shell", "src" ) )
+sys.path.insert( 0, os.path.join( HERE, "..", "Sudoku_Generator" ) )
+
+import board_generator
+import BTSolver
+import Labels
+import SudokuBoard
+import Trail
+
+"""
+    Reproducible benchmark for the Python backtracking solver.
+
+    Builds fixed-seed corpora of solvable boards with board_generator for
+    a set of (p, q, m) settings and runs every combination of MRV/MAD,
+    with and without LCV, and FC/NOR/AC3 on every board. Each run records
+    wall time, nodes, trail pushes, backtracks and peak memory. The
+    results are written to JSON. Optionally they are compared against a stored baseline, and
+    slower or larger runs are flagged as regressions.
+
+    Usage:
+        python3 benchmark.py [--sizes 3,3,20 2,3,10] [--boards 5] [--seed 0]
+                             [--timeout 30] [--out results.json]
+                             [--baseline baseline.json] [--threshold 1.25]
+                             [--min-delta 0.05] [--save-baseline] [--no-memory]
+"""
+
+# Names combined by configurations(), see Labels; "" leaves the heuristic unset
+VAR_NAMES = [ "MRV", "MAD" ]
+VAL_NAMES = [ "", "LCV" ]
+CHECK_NAMES = [ "FC", "NOR", "AC3" ]
+
+DEFAULT_SIZES = [ "2,2,4", "2,3,10", "3,3,20" ]
+
+# Every heuristic combination as (label, val_sh, var_sh, cc)
+def configurations ( ):
+    for names in itertools.product( VAR_NAMES, VAL_NAMES, CHECK_NAMES ):
+        label = "+".join( name for name in names if name )
+        member = Labels.parseMember( label, engines = False )
+        yield ( label, member["val_sh"], member["var_sh"], member["cc"] )
+
+# The same solvable boards on every run for the same seed and (p, q, m)
+def buildCorpus ( p, q, m, count, seed ):
+    return [ board_generator.makeSolvableBoard( p, q, m, "{}:{}x{}:{}:{}".format( seed, p, q, m, i ) )
+             for i in range( count ) ]
+
+# Solves one board with one configuration and returns its measurements
+def runBoard ( p, q, board, config, timeout ):
+    label, val_sh, var_sh, cc = config
+    sudokudata = SudokuBoard.SudokuBoard( p, q, board = [ row[:] for row in board ] )
+    trail = Trail.Trail()
+
+    start = time.perf_counter()
+    solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
+    consistent = solver.checkConsistency()
+    result = solver.solve( time_left = timeout ) if consistent else 0
+    elapsed = time.perf_counter() - start
+
+    if result == -1:
+        status = "timeout"
+    elif solver.hassolution:
+        status = "solved"
+    else:
+        status = "unsat"
+
+    return {
+        "status": status,
+        "time": elapsed,
+        "nodes": solver.nodes,
+        "pushes": trail.getPushCount(),
+        "backtracks": trail.getUndoCount(),
+        "trail_peak_bytes": trail.getPeakBytes(),
+    }
+
+# Peak Python heap use of a second, traced run (kept out of the timed run)
+def measureMemory ( p, q, board, config, timeout ):
+    tracemalloc.start()
+    try:
+        runBoard( p, q, board, config, timeout )
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def runBenchmark ( sizes, count, seed, timeout, memory ):
+    records = []
+    for p, q, m in sizes:
+        corpus = buildCorpus( p, q, m, count, seed )
+        for config in configurations():
+            for index, board in enumerate( corpus ):
+                record = runBoard( p, q, board, config, timeout )
+                record["peak_memory"] = measureMemory( p, q, board, config, timeout ) if memory else None
+                record.update( { "size": "{}x{}:{}".format( p, q, m ), "board": index, "config": config[0] } )
+                records.append( record )
+            print( "{:>10} {:<12} {:8.3f}s".format( records[-1]["size"], config[0],
+                   sum( r["time"] for r in records[-len(corpus):] ) ) )
+    return records
+
+# Totals per (size, configuration)
+def summarize ( records ):
+    summary = {}
+    for r in records:
+        key = r["size"] + " " + r["config"]
+        entry = summary.setdefault( key, { "time": 0.0, "nodes": 0, "pushes": 0, "backtracks": 0,
+                                           "peak_memory": 0, "timeouts": 0 } )
+        entry["time"] += r["time"]
+        entry["nodes"] += r["nodes"]
+        entry["pushes"] += r["pushes"]
+        entry["backtracks"] += r["backtracks"]
+        entry["peak_memory"] = max( entry["peak_memory"], r["peak_memory"] or 0 )
+        entry["timeouts"] += r["status"] == "timeout"
+    return summary
+
+"""
+    Compares the summary against a baseline summary. Time and memory may
+    grow by the threshold factor before they are flagged, and time changes
+    below minDelta seconds are treated as noise. Search counts are
+    deterministic for a fixed seed, so any growth in nodes counts.
+"""
+def findRegressions ( summary, baseline, threshold, minDelta ):
+    regressions = []
+    for key, entry in sorted( summary.items() ):
+        base = baseline.get( key )
+        if base is None:
+            continue
+        if entry["time"] > base["time"] * threshold and entry["time"] - base["time"] >= minDelta:
+            regressions.append( "{}: time {:.3f}s -> {:.3f}s".format( key, base["time"], entry["time"] ) )
+        if entry["nodes"] > base["nodes"]:
+            regressions.append( "{}: nodes {} -> {}".format( key, base["nodes"], entry["nodes"] ) )
+        if base["peak_memory"] and entry["peak_memory"] > base["peak_memory"] * threshold:
+            regressions.append( "{}: peak memory {} -> {}".format( key, base["peak_memory"], entry["peak_memory"] ) )
+        if entry["timeouts"] > base["timeouts"]:
+            regressions.append( "{}: timeouts {} -> {}".format( key, base["timeouts"], entry["timeouts"] ) )
+    return regressions
+
+def parseSize ( text ):
+    p, q, m = ( int( x ) for x in text.split( "," ) )
+    return ( p, q, m )
+
+def main ( ):
+    parser = argparse.ArgumentParser( description = "Benchmark the Sudoku CSP heuristics on fixed-seed corpora." )
+    parser.add_argument( "--sizes", nargs = "+", default = DEFAULT_SIZES, help = "p,q,m settings to generate" )
+    parser.add_argument( "--boards", type = int, default = 5, help = "boards per setting" )
+    parser.add_argument( "--seed", type = int, default = 0 )
+    parser.add_argument( "--timeout", type = float, default = 30, help = "seconds per board and configuration" )
+    parser.add_argument( "--out", default = "results.json" )
+    parser.add_argument( "--baseline", default = os.path.join( HERE, "baseline.json" ) )
+    parser.add_argument( "--threshold", type = float, default = 1.25, help = "allowed slowdown factor" )
+    parser.add_argument( "--min-delta", type = float, default = 0.05, help = "smallest time change in seconds worth flagging" )
+    parser.add_argument( "--save-baseline", action = "store_true", help = "store this run as the new baseline" )
+    parser.add_argument( "--no-memory", dest = "memory", action = "store_false", help = "skip the traced memory pass" )
+    args = parser.parse_args()
+
+    sizes = [ parseSize( s ) for s in args.sizes ]
+    records = runBenchmark( sizes, args.boards, args.seed, args.timeout, args.memory )
+    summary = summarize( records )
+
+    settings = { "sizes": args.sizes, "boards": args.boards, "seed": args.seed, "timeout": args.timeout }
+    with open( args.out, "w" ) as f:
+        json.dump( { "settings": settings, "summary": summary, "records": records }, f, indent = 2 )
+    print( "Results written to " + args.out )
+
+    if args.save_baseline:
+        with open( args.baseline, "w" ) as f:
+            json.dump( { "settings": settings, "summary": summary }, f, indent = 2 )
+        print( "Baseline written to " + args.baseline )
+        return 0
+
+    if not os.path.exists( args.baseline ):
+        return 0
+
+    with open( args.baseline ) as f:
+        baseline = json.load( f )
+    if baseline.get( "settings" ) != settings:
+        print( "[WARNING] Baseline was recorded with different settings: " + json.dumps( baseline.get( "settings" ) ) )
+
+    regressions = findRegressions( summary, baseline["summary"], args.threshold, args.min_delta )
+    for line in regressions:
+        print( "REGRESSION " + line )
+    if not regressions:
+        print( "No regressions against " + args.baseline )
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( HERE, "..", "Sudoku_Python_Shell", "src" ) )
+sys.path.insert( 0, os.path.join( HERE, "..", "Sudoku_Generator" ) )
+
+import board_generator
+import BTSolver
+import Labels
+import SudokuBoard
+import Trail
+
+"""
+    Scaling benchmark for the Python backtracking solver on growing boards.
+
+    For each p x q size it generates solvable boards (a fixed fraction of
+    the cells given, cut from a complete grid) and times, separately, the
+    construction of the constraint network, the initial propagation and
+    the search. Costs are reported per board, per cell and per search node,
+    so growth that is worse than linear in the number of cells stands out.
+
+    Usage:
+        python3 scaling.py [--sizes 3x3 4x4 5x5 6x6] [--boards 3] [--givens 0.6]
+                           [--configs MRV+NOR MRV+AC3] [--seed 0] [--timeout 60]
+                           [--out scaling.json]
+"""
+
+DEFAULT_SIZES = [ "3x3", "4x4", "5x5", "6x6" ]
+DEFAULT_CONFIGS = [ "MRV+NOR", "MRV+AC3" ]
+
+def parseSize ( text ):
+    p, q = ( int( x ) for x in text.lower().split( "x" ) )
+    return ( p, q )
+
+# Times the three phases of one solve
+def runBoard ( p, q, board, config, timeout ):
+    sudokudata = SudokuBoard.SudokuBoard( p, q, board = [ row[:] for row in board ] )
+    trail = Trail.Trail()
+
+    start = time.perf_counter()
+    solver = BTSolver.BTSolver( sudokudata, trail, config["val_sh"], config["var_sh"], config["cc"] )
+    built = time.perf_counter()
+    consistent = solver.checkConsistency()
+    propagated = time.perf_counter()
+    if not consistent:
+        result = 0
+    elif config["restarts"] != "":
+        result = solver.solveWithRestarts( config["restarts"], time_left = timeout )
+    else:
+        result = solver.solve( time_left = timeout )
+    searched = time.perf_counter()
+
+    if result == -1:
+        status = "timeout"
+    elif solver.hassolution:
+        status = "solved"
+    else:
+        status = "unsat"
+
+    return {
+        "status": status,
+        "build": built - start,
+        "propagate": propagated - built,
+        "search": searched - propagated,
+        "nodes": solver.nodes,
+        "backtracks": trail.getUndoCount(),
+    }
+
+def runScaling ( sizes, configs, count, givens, seed, timeout ):
+    rows = []
+    for p, q in sizes:
+        N = p*q
+        m = int( round( givens * N * N ) )
+        boards = [ board_generator.makeSolvableBoard( p, q, m, seed + i ) for i in range( count ) ]
+        for label in configs:
+            records = [ runBoard( p, q, board, Labels.parseMember( label, engines = False ), timeout ) for board in boards ]
+            cells = N * N
+            build = sum( r["build"] for r in records ) / count
+            propagate = sum( r["propagate"] for r in records ) / count
+            search = sum( r["search"] for r in records ) / count
+            nodes = sum( r["nodes"] for r in records )
+            row = {
+                "size": "{}x{}".format( p, q ),
+                "config": label,
+                "cells": cells,
+                "givens": m,
+                "build_per_board": build,
+                "build_per_cell_us": build / cells * 1e6,
+                "propagate_per_board": propagate,
+                "search_per_board": search,
+                "time_per_board": build + propagate + search,
+                "nodes_per_board": nodes / count,
+                "search_per_node_us": sum( r["search"] for r in records ) / nodes * 1e6 if nodes else None,
+                "timeouts": sum( r["status"] == "timeout" for r in records ),
+                "records": records,
+            }
+            rows.append( row )
+            printRow( row )
+    return rows
+
+def printHeader ( ):
+    print( "{:>6} {:<10} {:>6} {:>10} {:>10} {:>10} {:>10} {:>9} {:>11} {:>4}".format(
+           "size", "config", "cells", "board (s)", "build (s)", "us/cell", "prop (s)", "nodes", "us/node", "t/o" ) )
+
+def printRow ( row ):
+    perNode = row["search_per_node_us"]
+    print( "{:>6} {:<10} {:>6} {:>10.4f} {:>10.4f} {:>10.2f} {:>10.4f} {:>9.1f} {:>11} {:>4}".format(
+           row["size"], row["config"], row["cells"], row["time_per_board"], row["build_per_board"],
+           row["build_per_cell_us"], row["propagate_per_board"], row["nodes_per_board"],
+           "-" if perNode is None else "{:.1f}".format( perNode ), row["timeouts"] ) )
+
+def main ( ):
+    parser = argparse.ArgumentParser( description = "Measure how the Sudoku CSP solver scales with board size." )
+    parser.add_argument( "--sizes", nargs = "+", default = DEFAULT_SIZES, help = "board shapes as pxq" )
+    parser.add_argument( "--configs", nargs = "+", default = DEFAULT_CONFIGS, help = "e.g. MRV+NOR, MAD+LCV+AC3 or MRV+FC+LUBY" )
+    parser.add_argument( "--boards", type = int, default = 3, help = "boards per size" )
+    parser.add_argument( "--givens", type = float, default = 0.6, help = "fraction of cells given" )
+    parser.add_argument( "--seed", type = int, default = 0 )
+    parser.add_argument( "--timeout", type = float, default = 60, help = "seconds per board and configuration" )
+    parser.add_argument( "--out", default = "", help = "write the results as JSON" )
+    args = parser.parse_args()
+
+    try:
+        sizes = [ parseSize( s ) for s in args.sizes ]
+        for label in args.configs:
+            Labels.parseMember( label, engines = False )
+    except ValueError as e:
+        parser.error( str( e ) )
+
+    printHeader()
+    rows = runScaling( sizes, args.configs, args.boards, args.givens, args.seed, args.timeout )
+
+    if args.out != "":
+        settings = { "sizes": args.sizes, "configs": args.configs, "boards": args.boards,
+                     "givens": args.givens, "seed": args.seed, "timeout": args.timeout }
+        with open( args.out, "w" ) as f:
+            json.dump( { "settings": settings, "results": rows }, f, indent = 2 )
+        print( "Results written to " + args.out )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
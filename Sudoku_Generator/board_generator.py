@@ -1,5 +1,7 @@
+import os
 import sys
 import random
+import multiprocessing
 
 def isValidValue(row, col, value, p, q, N, board ):
     # check whether current value can be assigned to current variable
@@ -36,8 +38,11 @@ def intToOdometer ( n ):
 
     return toReturn
 
-def genBoard ( p, q, m, filename ):
+def makeBoard ( p, q, m ):
     N = p*q
+    if m < 0 or m > N*N:
+        raise ValueError( "m must be between 0 and " + str(N*N) + " for a " + str(p) + "x" + str(q) + " board" )
+
     board = [[0 for j in range(N)] for i in range(N)]
 
     while True:
@@ -51,26 +56,129 @@ def genBoard ( p, q, m, filename ):
             board[randomRow][randomCol] = randomAssignment
             m -= 1
 
-    file = open(filename, "w")
-    file.write( str(p) + " " + str(q) + "\n" )
-    for i in range(N):
-        for j in range(N):
-            file.write( intToOdometer( board[i][j] ) + " " )
-        file.write("\n")
+    return board
+
+def formatBoard ( p, q, board ):
+    lines = [ str(p) + " " + str(q) + "\n" ]
+    for row in board:
+        lines.append( "".join( intToOdometer( v ) + " " for v in row ) + "\n" )
+    return "".join( lines )
+
+def genBoard ( p, q, m, filename ):
+    board = makeBoard( p, q, m )
 
+    file = open(filename, "w")
+    file.write( formatBoard( p, q, board ) )
     file.close();
 
+# Returns a random complete grid: a valid base pattern, shuffled by the board's symmetries
+def makeGrid ( p, q, rng ):
+    N = p*q
 
-if len(sys.argv) != 6:
-    print ( "Usage: Board_Generator Base_File_Name #ofBoards p q m" )
-    exit(0)
+    # Rows within a band and bands may be permuted, likewise columns and stacks
+    bands = rng.sample( range(q), q )
+    rows = [ b*p + r for b in bands for r in rng.sample( range(p), p ) ]
+    stacks = rng.sample( range(p), p )
+    cols = [ s*q + c for s in stacks for c in rng.sample( range(q), q ) ]
+    values = rng.sample( range(1, N+1), N )
 
-baseFileName = sys.argv[1]
-numOfFiles = int(sys.argv[2])
-p = int(sys.argv[3])
-q = int(sys.argv[4])
-m = int(sys.argv[5])
+    grid = [ [ values[ ( q*(r % p) + r//p + c ) % N ] for c in cols ] for r in rows ]
+    if p == q and rng.random() < 0.5:
+        grid = [ list(col) for col in zip(*grid) ]
+    return grid
 
-for i in range(numOfFiles):
-    print ( "Creating world number: " + str(i) + "." )
-    genBoard( p, q, m, baseFileName + "_" + str(i) + ".txt" )
\ No newline at end of file
+# Returns a board with m givens cut from a random complete grid, so it always has a solution
+def makeSolvableBoard ( p, q, m, seed ):
+    N = p*q
+    rng = random.Random( seed )
+    grid = makeGrid( p, q, rng )
+    for cell in rng.sample( range(N*N), N*N - m ):
+        grid[cell // N][cell % N] = 0
+    return grid
+
+def formatSolvableBoard ( args ):
+    p, q, m, seed = args
+    return formatBoard( p, q, makeSolvableBoard( p, q, m, seed ) )
+
+def packSolvableBoard ( args ):
+    p, q, m, seed = args
+    return bytes( v for row in makeSolvableBoard( p, q, m, seed ) for v in row )
+
+# The binary board format lives with the solver
+def binaryBoards ( ):
+    sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "Sudoku_Python_Shell", "src" ) )
+    import BinaryBoards
+    return BinaryBoards
+
+"""
+    Writes count solvable boards to a single file, generated across jobs
+    processes. Board i is built from seed + i, so the output is the same
+    for a given seed no matter how many processes are used. A filename
+    ending in .sdb gets the packed binary board format, anything else the
+    text board format.
+"""
+def genBulk ( p, q, m, count, filename, jobs = 1, seed = 0 ):
+    N = p*q
+    if m < 0 or m > N*N:
+        raise ValueError( "m must be between 0 and " + str(N*N) + " for a " + str(p) + "x" + str(q) + " board" )
+
+    tasks = ( ( p, q, m, seed + i ) for i in range(count) )
+    chunksize = max( 1, count // ( jobs * 16 ) )
+
+    if filename.endswith( ".sdb" ):
+        header = binaryBoards().packHeader( p, q )
+        make = packSolvableBoard
+        file = open( filename, "wb", buffering = 1 << 20 )
+        file.write( header )
+    else:
+        make = formatSolvableBoard
+        file = open( filename, "w", buffering = 1 << 20 )
+
+    with file:
+        if jobs <= 1:
+            file.writelines( map( make, tasks ) )
+            return
+
+        with multiprocessing.Pool( jobs ) as pool:
+            file.writelines( pool.imap( make, tasks, chunksize ) )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 7 and sys.argv[1] == "--bulk":
+        if len(sys.argv) > 9:
+            print ( "Usage: Board_Generator --bulk Output_File #ofBoards p q m [jobs] [seed]" )
+            exit(0)
+
+        count, p, q, m = ( int(x) for x in sys.argv[3:7] )
+        jobs = int(sys.argv[7]) if len(sys.argv) > 7 else 1
+        seed = int(sys.argv[8]) if len(sys.argv) > 8 else 0
+        if jobs <= 0:
+            jobs = multiprocessing.cpu_count()
+
+        try:
+            genBulk( p, q, m, count, sys.argv[2], jobs, seed )
+        except ValueError as e:
+            print ( "[ERROR] " + str(e) )
+            exit(1)
+        print ( "Wrote " + str(count) + " boards to " + sys.argv[2] + "." )
+        exit(0)
+
+    if len(sys.argv) != 6:
+        print ( "Usage: Board_Generator Base_File_Name #ofBoards p q m" )
+        print ( "       Board_Generator --bulk Output_File #ofBoards p q m [jobs] [seed]" )
+        exit(0)
+
+    baseFileName = sys.argv[1]
+    numOfFiles = int(sys.argv[2])
+    p = int(sys.argv[3])
+    q = int(sys.argv[4])
+    m = int(sys.argv[5])
+
+    try:
+        for i in range(numOfFiles):
+            print ( "Creating world number: " + str(i) + "." )
+            genBoard( p, q, m, baseFileName + "_" + str(i) + ".txt" )
+    except ValueError as e:
+        print ( "[ERROR] " + str(e) )
+        print ( "Usage: Board_Generator Base_File_Name #ofBoards p q m" )
+        exit(1)
\ No newline at end of file
@@ -1,11 +1,16 @@
+import Budget
 import SudokuBoard
 import Variable
 import Domain
 import Trail
 import Constraint
 import ConstraintNetwork
+import Instrumentation
+import MRVIndex
+import Restarts
 import time
 import random
+import collections
 
 class BTSolver:
 
@@ -23,6 +28,40 @@ class BTSolver:
         self.valHeuristics = val_sh
         self.cChecks = cc
 
+        # Bucket queue for the MRV heuristics, built on first use
+        self.mrvIndex = None
+
+        # Number of assignments tried by solve()
+        self.nodes = 0
+
+        # Set by search() when it stops on its budget, and how the last
+        # search ended (a Budget status), see getResult
+        self.budgetExceeded = False
+        self.status = None
+
+        # Random tie-breaking for the heuristics, see randomize, and the
+        # restart state of solveWithRestarts
+        self.rng = None
+        self.cutoffReached = False
+        self.restarts = 0
+
+        # Solutions found by countSolutions, and the first of them
+        self.solutionCount = None
+        self.solution = None
+
+        # Per-phase profiling, see enableInstrumentation
+        self.instrumentation = None
+
+        # Variables assigned since the last incremental propagation, and
+        # whether propagating the givens left the network consistent (None
+        # until checkConsistency is first called)
+        self.propagationQueue = collections.deque()
+        self.rootConsistent = None
+
+        # (constraint, value) pairs left with at most one place, see norvigCheck
+        self.hiddenSingleQueue = collections.deque()
+        self.valueCountsEnabled = False
+
     # ==================================================================
     # Consistency Checks
     # ==================================================================
@@ -47,74 +86,16 @@ class BTSolver:
         Return: a tuple of a dictionary and a bool. The dictionary contains all MODIFIED variables, mapped to their MODIFIED domain.
                 The bool is true if assignment is consistent, false otherwise.
     """
-
-    from math import floor
-    def calcBlock(self,p,q):
-        # block = int(((floor(i/sboard.p) * sboard.p) + floor(j/sboard.q)))
-        return (p//3) + 3*(q//3)
-
-    def updateModVars(self,mod_vars,p,q,value):
-
-        # if variable is already assigned, do nothing
-        if self.gameboard.board[p][q]:
-            return
-
-        cur_mod_var = mod_vars[p][q]
-
-        # if variable not in mod_vars, add
-        if not cur_mod_var:
-            block = self.calcBlock(p,q)
-            cur_mod_var = Variable.Variable(list(range(9)),p,q,block)
-            mod_vars[p][q] = cur_mod_var
-
-        # remove value from domain of variable
-
-        cur_mod_var.removeValueFromDomain(value)
-
-    def checkNeighborRow(self,mod_vars,p,q,value):
-        for pSub in range(9):
-            # don't check the same tile
-            if pSub==p:
-                pass
-            self.updateModVars(mod_vars,pSub,q,value)
-
-    def checkNeighborColumn(self,mod_vars,p,q,value):
-        for qSub in range(9):
-            # don't check the same tile
-            if qSub==q:
-                pass
-            self.updateModVars(mod_vars,p,qSub,value)
-
-    def checkNeighborBlock(self,mod_vars,p,q,value):
-        block = self.calcBlock(p,q)
-        
-        for p_ in range(3):
-            for q_ in range(3):
-                pSub = p_ + 3*(block%3)
-                qSub = q_ + 3*(block//3)
-
-                if pSub==p and qSub==q:
-                    pass
-                self.updateModVars(mod_vars,pSub,qSub,value)
-
-    def checkNeighbors(self,mod_vars,p,q):
-        value = self.gameboard.board[p][q]
-
-        self.checkNeighborRow(mod_vars,p,q,value)
-        self.checkNeighborColumn(mod_vars,p,q,value)
-        self.checkNeighborBlock(mod_vars,p,q,value)
-
     def forwardChecking ( self ):
         mod_vars = []               #list of modified items
         modified_vars_dict = {}     #dictionary that we created to learn which variables were modified
         assigned_list = []
         consistent = True
 
-        #get all the constraints (network here is CSP) and put appropriate variables in a list
-        for constraints in self.network.constraints:
-            for var in constraints.vars:
-                if var.isAssigned():                #check to see that a variable is already assigned (non 0)
-                    assigned_list.append(var)       #it's assigned so added into list to take care of its neigbors below.
+        #go over every variable once (scanning the constraints would list each one three times)
+        for var in self.network.variables:
+            if var.isAssigned():                #check to see that a variable is already assigned (non 0)
+                assigned_list.append(var)       #it's assigned so added into list to take care of its neigbors below.
         
         for assigned_variables in assigned_list:   #here take care of the neigbors of the list
             for neighbor in self.network.getNeighborsOfVariable(assigned_variables):    #pruning
@@ -130,52 +111,112 @@ class BTSolver:
             if tuple[0].size() == 0:                                                    # size return domain size, if (after removals) there is no more option left
                 consistent = False                                                      #  then it's not consistent and make that appropriate variable flag False.
         return (modified_vars_dict,consistent)                      
-        
-        '''
-                    var_list = self.network.getVariables()
-                    for var in var_list:
-                        if var.isChangeable():
-                            domain = var.getDomain()  # get the domain from variable.py
-                            trail = self.trail.placeTrailMarker()
-                            for value in domain:
-                                var.assignValue(value)
-                                consistent = True
-                                # check consistency with its neighbors
-                                for neighbor in self.network.getNeighborsOfVariable(var):
-                                    if neighbor.isChangeable() and not neighbor.hasValue(value):
-                                        consistent = False
-                                        break
-                                if consistent:
-                                    modified_vars[var] = var.getAssignment()
-                                    self.updateModVars(mod_vars, p, q, var)
-                                    break
-                                else:
-                                    var.unassignValue()
-                            self.trail.push(var)
-                            if not var.getDomain():
-                                return (modified_vars, False)
-        return (modified_vars, True)                            #all assignments are legit and consistent, so return the tuple
-        '''
+
+    """
+        Incremental Forward Checking
+
+        Prunes the same values as forwardChecking, but only propagates
+        from the variables assigned since the last call instead of from
+        every assigned variable on the board. solve() queues each variable
+        it assigns; checkConsistency seeds the queue with the givens before
+        the first decision. Everything removed is pushed on the trail
+        first, so the regular undo in solve() restores it.
+
+        When assigned_singles is a dictionary, a neighbor left with a
+        single value is assigned it, recorded there, and queued in turn.
+
+        Return: the same tuple as forwardChecking.
+    """
+    def incrementalForwardChecking ( self, assigned_singles = None ):
+        modified_vars_dict = {}
+        queue = self.propagationQueue
+
+        while queue:
+            av = queue.popleft()
+            value = av.getAssignment()
+            for neighbor in self.network.getNeighborsOfVariable( av ):
+                if neighbor.isAssigned():
+                    if neighbor.getAssignment() == value:
+                        queue.clear()
+                        return ( modified_vars_dict, False )
+                    continue
+
+                if neighbor.getDomain().contains( value ):
+                    self.trail.push( neighbor )
+                    neighbor.removeValueFromDomain( value )
+                    modified_vars_dict[neighbor] = neighbor.getDomain()
+                    if neighbor.size() == 0:
+                        queue.clear()
+                        return ( modified_vars_dict, False )
+
+                    if assigned_singles is not None and neighbor.size() == 1:
+                        single = neighbor.getDomain().first()
+                        neighbor.assignValue( single )
+                        assigned_singles[neighbor] = single
+                        queue.append( neighbor )
+
+        return ( modified_vars_dict, True )
 
     # =================================================================
 	# Arc Consistency
 	# =================================================================
-    def arcConsistency( self ):                                         # Chech for constarint consistency 
-        assignedVars = []
-        for c in self.network.constraints:
-            for v in c.vars:
-                if v.isAssigned():
-                    assignedVars.append(v)
-        while len(assignedVars) != 0:
-            av = assignedVars.pop(0)
-            for neighbor in self.network.getNeighborsOfVariable(av):
-                if neighbor.isChangeable and not neighbor.isAssigned() and neighbor.getDomain().contains(av.getAssignment()):
-                    neighbor.removeValueFromDomain(av.getAssignment())
-                    if neighbor.domain.size() == 1:
-                        neighbor.assignValue(neighbor.domain.values[0])
-                        assignedVars.append(neighbor)
-
-    
+    """
+        AC-3 over the binary not-equal arcs between neighbors.
+
+        Revising arc (xi, xj) removes xj's value from xi's domain once xj
+        is down to a single value. That is the only way a not-equal arc
+        can prune. So the arcs into xi are queued again only when xi
+        itself is left with one value, and it is then assigned that value.
+        Arcs wait in a deque, and a set keeps each one queued at most once.
+
+        The arcs are seeded from the variables assigned since the last call
+        (every single-valued variable on the root call, see
+        checkConsistency). Every domain is pushed on the trail before it
+        changes, so undo restores it.
+
+        Return: the same tuple as forwardChecking.
+    """
+    def arcConsistency ( self ):
+        modified_vars_dict = {}
+        neighborsOf = self.network.getNeighborsOfVariable
+        arcs = collections.deque()
+        queued = set()
+
+        while self.propagationQueue:
+            xj = self.propagationQueue.popleft()
+            for xi in neighborsOf( xj ):
+                if ( xi, xj ) not in queued:
+                    queued.add( ( xi, xj ) )
+                    arcs.append( ( xi, xj ) )
+
+        while arcs:
+            arc = arcs.popleft()
+            queued.discard( arc )
+            xi, xj = arc
+
+            # Revise xi against xj
+            if xj.size() != 1:
+                continue
+            value = xj.getDomain().first()
+            if not xi.getDomain().contains( value ):
+                continue
+
+            if xi.size() == 1 or not xi.isChangeable():
+                return ( modified_vars_dict, False )
+
+            self.trail.push( xi )
+            xi.removeValueFromDomain( value )
+            modified_vars_dict[xi] = xi.getDomain()
+
+            if xi.size() == 1:
+                xi.assignValue( xi.getDomain().first() )
+                for xk in neighborsOf( xi ):
+                    if xk is not xj and ( xk, xi ) not in queued:
+                        queued.add( ( xk, xi ) )
+                        arcs.append( ( xk, xi ) )
+
+        return ( modified_vars_dict, True )
+
     """
         Part 2 TODO: Implement both of Norvig's Heuristics
 
@@ -194,43 +235,46 @@ class BTSolver:
                 The bool is true if assignment is consistent, false otherwise.
     """
     def norvigCheck(self):
-        # Norvig's first strategy is Forward Checking.
-        # Norvig's second strategy is if a box has one possible place for a value, then put the value there.
-
-        # Dictionary to store modified variables and their assigned values.
-        # List to store not assigned variables in our board (To check len = 1).
-        # Initialize the consistency flag to True.
-        modified_vars_dict = {}
-        not_assigned = []
-        consistent = True
-        
-        # 1) First Strategy: Forward Checking
-        modified_vars_dict, consistent = self.forwardChecking()
-
-        # 2) Second Strategy
-        # For each unassigned variable, the code checks if there is only one value in the domain. 
-        # If so, it assigns that value to the variable, and removes it from the domains of all neighbors.
-
-        for constraint in self.network.constraints:
-            for var in constraint.vars:
-                if var.size() == 0:  # If there are no possible values left for a variable, return failure
-                        return (modified_vars_dict, False)
-                else:
+        # Norvig's first strategy is Forward Checking, with naked singles
+        # assigned as soon as they appear.
+        # Norvig's second strategy reads the per-constraint value counts: a
+        # count of one is a hidden single, a count of zero a dead end.
+        assigned_vars_dict = {}
+        hiddenSingles = self.hiddenSingleQueue
+
+        if not self.valueCountsEnabled:
+            self.valueCountsEnabled = True
+            numValues = self.gameboard.N
+            for c in self.network.getConstraints():
+                c.enableValueCounts( numValues, hiddenSingles )
+                hiddenSingles.extend( ( c, value ) for value in range( 1, numValues + 1 ) if c.valueCounts[value] <= 1 )
+
+        while True:
+            # 1) First Strategy: propagate every assignment made so far
+            consistent = self.incrementalForwardChecking( assigned_vars_dict )[1]
+            if not consistent:
+                hiddenSingles.clear()
+                return ( assigned_vars_dict, False )
+
+            if not hiddenSingles:
+                return ( assigned_vars_dict, True )
+
+            # 2) Second Strategy: place values with one spot left in a constraint
+            while hiddenSingles:
+                c, value = hiddenSingles.popleft()
+                count = c.valueCounts[value]
+                if count == 0:
+                    hiddenSingles.clear()
+                    self.propagationQueue.clear()
+                    return ( assigned_vars_dict, False )
+
+                if count == 1:
+                    var = c.findValue( value )
                     if not var.isAssigned():
-                        # For each unassigned variable in the constraint, check the domain
-                        not_assigned = var.getValues()                                                    #values is list of values
-                        if len(not_assigned) == 1:                                                        #if there is only one possible value
-                            val = not_assigned[0]                                                         #get the value
-                            self.trail.push(var)                                                          #push that into trail
-                            var.assignValue(val)                                                          #assign it
-                            modified_vars_dict[var] = val                                                 #plug it into dict
-                            # Check the neighbors and take the value out from their domains
-                            for neighbor in self.network.getNeighborsOfVariable(var):
-                                if neighbor.isChangeable() and not neighbor.isAssigned() and neighbor.getDomain().contains(val):
-                                    self.trail.push(neighbor)
-                                    neighbor.removeValueFromDomain(val)
-                                    modified_vars_dict[neighbor] = neighbor.getDomain()
-        return (modified_vars_dict, consistent)
+                        self.trail.push( var )
+                        var.assignValue( value )
+                        assigned_vars_dict[var] = value
+                        self.propagationQueue.append( var )
 
     """
          Optional TODO: Implement your own advanced Constraint Propagation
@@ -260,20 +304,7 @@ class BTSolver:
         Return: The unassigned variable with the smallest domain
     """
     def getMRV ( self ):
-
-        # get -> variables
-        vars = self.network.getVariables()
-
-        # filter -> unassigned variables
-        vars = list(filter(lambda v:not v.isAssigned(),vars))
-
-        # return nothing if all variables are assigned
-        if not len(vars):
-            return None
-        
-        # return element with lowest domain
-        v = min(vars,key=lambda var: var.getDomain().size())
-        return v
+        return self.getMRVIndex().getMRV( self.rng )
 
     """
         Part 2 TODO: Implement the Minimum Remaining Value Heuristic
@@ -284,34 +315,20 @@ class BTSolver:
                 If there is only one variable, return the list of size 1 containing that variable.
     """
     def MRVwithTieBreaker ( self ):
-        # get -> variables
-        vars = self.network.getVariables()
-
-        # filter -> unassigned variables
-        vars = list(filter(lambda v:not v.isAssigned(),vars))
+        vars = self.getMRVIndex().getMRVwithTieBreaker()
 
         # return nothing if all variables are assigned
         if not len(vars):
-            # print('All vars have been assigned')
             return [None]
-        
-        # get min domain
-        min_d = min(map(lambda var: var.getDomain().size(),vars))
 
-        # get all variables with domain equal to min domain
-        vars = list(filter(lambda var: var.getDomain().size() == min_d,vars))
-
-        # tie -> return list of vars with greatest degree
-        if len(vars):
-            # get max degrees
-            max_d = min(map(lambda var: len(self.network.getNeighborsOfVariable(var)),vars))
-
-            # get all variables with degrees equal to max degrees
-            vars = list(filter(lambda var: len(self.network.getNeighborsOfVariable(var)) == max_d,vars))
-        
-        # print(len(vars))
         return vars
 
+    # Returns the bucket queue behind the MRV heuristics, building it on first use
+    def getMRVIndex ( self ):
+        if self.mrvIndex is None:
+            self.mrvIndex = MRVIndex.MRVIndex( self.network )
+        return self.mrvIndex
+
     """
          Optional TODO: Implement your own advanced Variable Heuristic
 
@@ -328,6 +345,10 @@ class BTSolver:
     # Default Value Ordering
     def getValuesInOrder ( self, v ):
         values = v.domain.values
+        if self.rng is not None:
+            values = list( values )
+            self.rng.shuffle( values )
+            return values
         return sorted( values )
 
     """
@@ -350,7 +371,12 @@ class BTSolver:
                     counter += 1
             set_domain.add((vd, counter))
         
-        for tuple in sorted(set_domain, key=lambda x: x[1]):
+        # Randomized runs break ties between equally constraining values at random
+        key = lambda x: x[1]
+        if self.rng is not None:
+            key = lambda x: ( x[1], self.rng.random() )
+
+        for tuple in sorted(set_domain, key=key):
             return_list.append(tuple[0])
         
         return return_list
@@ -368,13 +394,36 @@ class BTSolver:
     # Engine Functions
     # ==================================================================
 
-    def solve ( self, time_left=600):
-        if time_left <= 60:
-            return -1
-
-        start_time = time.time()
-        if self.hassolution:
-            return 0
+    """
+        Backtracking search over an explicit decision stack, so deep boards
+        do not run into Python's recursion limit. Each frame holds a
+        variable, an iterator over the values still to try for it, and
+        whether one of those values is currently on the trail.
+
+        This is a generator. It yields every time the variables hold a
+        complete, consistent assignment, with that assignment still on the
+        trail. Resuming it backtracks into the next solution. When the
+        budget runs out or is cancelled it stops, setting budgetExceeded
+        and status to Budget.TIMEOUT or Budget.CANCELLED.
+
+        budget:    a Budget, started here against self.nodes
+        undoLimit: trail undo count at which to give up and set
+                   cutoffReached, for restarts, or None
+    """
+    def search ( self, budget, undoLimit = None ):
+        self.budgetExceeded = False
+        self.cutoffReached = False
+        checkAt = budget.start( self.nodes )
+        if undoLimit is None:
+            undoLimit = float( "inf" )
+        trail = self.trail
+
+        # Propagate the givens before any trail marker, so no backtrack
+        # undoes their pruning; a board they rule out is never searched
+        if self.rootConsistent is None:
+            self.checkConsistency()
+        if not self.rootConsistent:
+            return
 
         # Variable Selection
         v = self.selectNextVariable()
@@ -382,42 +431,234 @@ class BTSolver:
         # check if the assigment is complete
         if ( v == None ):
             # Success
-            self.hassolution = True
-            return 0
+            yield
+            return
 
-        # Attempt to assign a value
-        for i in self.getNextValues( v ):
+        stack = [ [ v, iter( self.getNextValues( v ) ), False ] ]
+        while stack:
+            frame = stack[-1]
+
+            # Undo the value tried last at this level before the next one
+            if frame[2]:
+                self.trail.undo()
+                frame[2] = False
+
+            i = next( frame[1], None )
+            if i is None:
+                stack.pop()
+                continue
+
+            self.nodes += 1
+            if self.nodes >= checkAt:
+                stop = budget.check( self.nodes )
+                if stop is not None:
+                    # The refused node is not visited, so it is not counted
+                    self.nodes -= 1
+                    self.budgetExceeded = True
+                    self.status = stop
+                    return
+                checkAt = budget.nextCheck( self.nodes )
+
+            if trail.numUndo >= undoLimit:
+                self.cutoffReached = True
+                return
 
             # Store place in trail and push variable's state on trail
+            v = frame[0]
             self.trail.placeTrailMarker()
             self.trail.push( v )
+            frame[2] = True
 
             # Assign the value
             v.assignValue( i )
+            self.propagationQueue.append( v )
 
-            # Propagate constraints, check consistency, recur
+            # Propagate constraints, check consistency, descend
             if self.checkConsistency():
-                elapsed_time = time.time() - start_time 
-                new_start_time = time_left - elapsed_time
-                if self.solve(time_left=new_start_time) == -1:
-                    return -1
-                
-            # If this assignment succeeded, return
-            if self.hassolution:
-                return 0
+                v = self.selectNextVariable()
+                if ( v == None ):
+                    yield
+                    continue
 
-            # Otherwise backtrack
-            self.trail.undo()
-        
+                stack.append( [ v, iter( self.getNextValues( v ) ), False ] )
+
+    """
+        Searches for the first solution and leaves it assigned.
+
+        time_left:  wall-clock seconds the search may run for
+        node_limit: maximum number of assignments to try, or None
+        budget:     a Budget to use instead of time_left and node_limit,
+                    e.g. to cancel the search from another thread
+
+        Return: 0 once the search is over (see hassolution), or -1 if it
+                was stopped first. status tells which.
+    """
+    def solve ( self, time_left=600, node_limit=None, budget=None ):
+        if self.hassolution:
+            self.status = Budget.SOLVED
+            return 0
+
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+
+        for found in self.search( budget ):
+            self.hassolution = True
+            self.status = Budget.SOLVED
+            return 0
+
+        if self.budgetExceeded:
+            return -1
+        self.status = Budget.UNSAT
         return 0
 
+    """
+        Searches for the first solution with randomized tie-breaking,
+        starting over from the initial state whenever a run uses up its
+        backtrack cutoff. Cutoffs follow a restart schedule and are counted
+        with the trail's undo count. Runs with different random choices
+        avoid the very long searches that one unlucky early decision can
+        cause on hard boards. Each cutoff is larger than the last often
+        enough that an unsatisfiable board is still proven so eventually.
+
+        schedule:   Restarts.LUBY or Restarts.GEOMETRIC
+        seed:       seed of the random tie-breaking, for reproducible runs
+        unit:       backtracks allowed in the first run
+        time_left:  wall-clock seconds for all the runs together
+        node_limit: maximum number of assignments over all runs, or None
+        budget:     a Budget to use instead of time_left and node_limit
+
+        Return: the same as solve. restarts holds the number of restarts.
+    """
+    def solveWithRestarts ( self, schedule=Restarts.LUBY, seed=0, unit=Restarts.DEFAULT_UNIT,
+                            time_left=600, node_limit=None, budget=None ):
+        if self.hassolution:
+            self.status = Budget.SOLVED
+            return 0
+
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+
+        self.randomize( seed )
+        self.restarts = 0
+        depth = len( self.trail.trailMarker )
+        for cutoff in Restarts.cutoffs( schedule, unit ):
+            for found in self.search( budget, self.trail.getUndoCount() + cutoff ):
+                self.hassolution = True
+                self.status = Budget.SOLVED
+                return 0
+
+            if self.budgetExceeded:
+                return -1
+
+            # The run covered the whole search space without the cutoff
+            if not self.cutoffReached:
+                self.status = Budget.UNSAT
+                return 0
+
+            while len( self.trail.trailMarker ) > depth:
+                self.trail.undo()
+            self.restarts += 1
+
+    # Breaks heuristic ties (and orders values) at random from now on
+    def randomize ( self, seed ):
+        self.rng = random.Random( seed )
+
+    """
+        Counts solutions, backtracking past each one, and stops as soon as
+        limit of them are found. With limit=2 this decides whether a
+        puzzle has a unique solution. The first solution found is kept for
+        getSolution.
+
+        time_left:  wall-clock seconds the search may run for
+        node_limit: maximum number of assignments to try, or None
+        budget:     a Budget to use instead of time_left and node_limit
+
+        Return: the number of solutions found, at most limit. It is only a
+                lower bound if budgetExceeded is set.
+    """
+    def countSolutions ( self, limit=2, time_left=600, node_limit=None, budget=None ):
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+
+        self.solutionCount = 0
+        for found in self.search( budget ):
+            self.solutionCount += 1
+            if self.solutionCount == 1:
+                self.hassolution = True
+                self.solution = self.getSolution()
+            if self.solutionCount >= limit:
+                break
+
+        if not self.budgetExceeded:
+            self.status = Budget.SOLVED if self.solutionCount > 0 else Budget.UNSAT
+        return self.solutionCount
+
+    """
+        Lazily yields every solution (as a SudokuBoard) in search order. The
+        search is suspended between solutions, so taking the first k with
+        itertools.islice costs only the work needed to reach them. When the
+        generator is exhausted or closed, the trail is undone back to where
+        it started, leaving the board as it was before the first solution.
+
+        time_left:  wall-clock seconds the enumeration may run for, or None
+        node_limit: maximum number of assignments to try, or None
+        budget:     a Budget to use instead of time_left and node_limit
+
+        Check budgetExceeded afterwards to tell whether the enumeration
+        was complete.
+    """
+    def solutions ( self, time_left=None, node_limit=None, budget=None ):
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+
+        depth = len( self.trail.trailMarker )
+        search = self.search( budget )
+        anySolution = False
+        try:
+            for found in search:
+                anySolution = True
+                yield self.network.toSudokuBoard( self.gameboard.p, self.gameboard.q )
+        finally:
+            search.close()
+            while len( self.trail.trailMarker ) > depth:
+                self.trail.undo()
+            if not self.budgetExceeded:
+                self.status = Budget.SOLVED if anySolution else Budget.UNSAT
+
+    """
+        Propagates with the configured check and tells whether the network
+        is still consistent. The first call is the root call: it seeds the
+        incremental checks with the givens and records its answer in
+        rootConsistent. search() makes it before the first decision unless
+        the caller already has.
+    """
     def checkConsistency ( self ):
-        if self.cChecks == "forwardChecking":
-            return self.forwardChecking()[1]
+        if self.rootConsistent is None:
+            if self.cChecks == "arcConsistency":
+                self.propagationQueue.extend( v for v in self.network.variables if v.size() == 1 )
+            else:
+                self.propagationQueue.extend( v for v in self.network.variables if v.isAssigned() )
+            self.rootConsistent = self.propagate()
+            return self.rootConsistent
+        return self.propagate()
+
+    # Runs the configured check once
+    def propagate ( self ):
+        if self.cChecks == "incrementalForwardChecking":
+            return self.incrementalForwardChecking()[1]
 
         if self.cChecks == "norvigCheck":
             return self.norvigCheck()[1]
 
+        if self.cChecks == "arcConsistency":
+            return self.arcConsistency()[1]
+
+        # Only the incremental checks consume the propagation queue
+        self.propagationQueue.clear()
+
+        if self.cChecks == "forwardChecking":
+            return self.forwardChecking()[1]
+
         if self.cChecks == "tournCC":
             return self.getTournCC()
 
@@ -429,6 +670,8 @@ class BTSolver:
             return self.getMRV()
 
         if self.varHeuristics == "MRVwithTieBreaker":
+            if self.rng is not None:
+                return self.rng.choice( self.MRVwithTieBreaker() )
             return self.MRVwithTieBreaker()[0]
 
         if self.varHeuristics == "tournVar":
@@ -447,5 +690,28 @@ class BTSolver:
         else:
             return self.getValuesInOrder( v )
 
+    # Starts recording per-phase counts and timings; returns the Instrumentation
+    def enableInstrumentation ( self ):
+        if self.instrumentation is None:
+            Instrumentation.Instrumentation().attach( self )
+        return self.instrumentation
+
+    """
+        Summarizes the last search: its status (Budget.SOLVED, UNSAT,
+        TIMEOUT or CANCELLED, or None before any search) and the work done
+        so far, which is complete even when the search was stopped early.
+    """
+    def getResult ( self ):
+        return {
+            "status": self.status,
+            "nodes": self.nodes,
+            "pushes": self.trail.getPushCount(),
+            "backtracks": self.trail.getUndoCount(),
+            "solutions": self.solutionCount,
+            "restarts": self.restarts,
+        }
+
     def getSolution ( self ):
+        if self.solution is not None:
+            return self.solution
         return self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q)
@@ -0,0 +1,144 @@
+import mmap
+import struct
+import SudokuBoard
+
+"""
+    Packed binary board files.
+
+    A file starts with an 8 byte header: the magic bytes "SDKB", a format
+    version, then p and q. The boards follow as fixed-size records of N*N
+    bytes, one byte per cell in row-major order with 0 for a blank. Every
+    board in a file has the same p and q, so board i starts at byte
+    8 + i*N*N and any board can be read without scanning the ones before.
+"""
+
+MAGIC = b"SDKB"
+VERSION = 1
+HEADER = struct.Struct( "<4sBBBx" )
+
+# Odometer boards go up to 36x36, so every value fits in a byte
+MAX_N = 255
+
+def packHeader ( p, q ):
+    if p < 1 or q < 1 or p*q > MAX_N:
+        raise ValueError( "Cannot store " + str(p) + "x" + str(q) + " boards in one byte per cell" )
+    return HEADER.pack( MAGIC, VERSION, p, q )
+
+# Packs a board given as a list of rows into one record
+def packBoard ( board ):
+    return bytes( v for row in board for v in row )
+
+# True if the file at path starts with the binary header
+def isBinary ( path ):
+    with open( path, "rb" ) as f:
+        return f.read( len( MAGIC ) ) == MAGIC
+
+"""
+    Appends boards of one shape to a new binary board file. Use as a
+    context manager, or call close() when done.
+"""
+class BoardWriter:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, path, p, q ):
+        self.p = p
+        self.q = q
+        self.N = p*q
+        self.count = 0
+        self.file = open( path, "wb" )
+        self.file.write( packHeader( p, q ) )
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exc ):
+        self.close()
+
+    # ==================================================================
+    # Writing
+    # ==================================================================
+
+    def write ( self, sb ):
+        if sb.p != self.p or sb.q != self.q:
+            raise ValueError( "A " + str(self.p) + "x" + str(self.q) + " board file cannot hold a "
+                              + str(sb.p) + "x" + str(sb.q) + " board" )
+        self.writePacked( packBoard( sb.board ) )
+
+    # Writes a record made by packBoard
+    def writePacked ( self, record ):
+        if len( record ) != self.N * self.N:
+            raise ValueError( "Record of " + str(len(record)) + " bytes instead of " + str(self.N * self.N) )
+        self.file.write( record )
+        self.count += 1
+
+    def close ( self ):
+        self.file.close()
+
+"""
+    Random-access reader over a binary board file, backed by a memory map.
+    len() is the number of boards, reader[i] builds board i, and iterating
+    yields every board in order.
+"""
+class BoardReader:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, path ):
+        with open( path, "rb" ) as f:
+            header = f.read( HEADER.size )
+            if len( header ) < HEADER.size:
+                raise ValueError( path + " is too short to be a binary board file" )
+
+            magic, version, p, q = HEADER.unpack( header )
+            if magic != MAGIC:
+                raise ValueError( path + " is not a binary board file" )
+            if version != VERSION:
+                raise ValueError( path + " has unsupported version " + str(version) )
+
+            self.buffer = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+
+        self.p = p
+        self.q = q
+        self.N = p*q
+        self.recordSize = self.N * self.N
+
+        size = len( self.buffer ) - HEADER.size
+        if size % self.recordSize != 0:
+            raise ValueError( path + " ends in the middle of a board" )
+        self.count = size // self.recordSize
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exc ):
+        self.close()
+
+    def close ( self ):
+        self.buffer.close()
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def __len__ ( self ):
+        return self.count
+
+    def __getitem__ ( self, i ):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError( "board index out of range" )
+
+        N = self.N
+        start = HEADER.size + i * self.recordSize
+        cells = list( self.buffer[start:start + self.recordSize] )
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = [ cells[r*N:(r+1)*N] for r in range( N ) ] )
+
+    def __iter__ ( self ):
+        for i in range( self.count ):
+            yield self[i]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+"""
+    Limits on one search: a wall-clock deadline, a maximum number of nodes
+    and a cancellation flag that another thread (or, with a
+    multiprocessing.Event, another process) can set.
+
+    Searches do not consult the budget at every node. start() and
+    nextCheck() return the node count at which the next check is due, so
+    the hot loop only compares two integers. The clock and the flag are
+    read every checkEvery nodes, and the node limit is still exact.
+"""
+
+# How a search ended
+SOLVED = "solved"
+UNSAT = "unsat"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+# Nodes between two reads of the clock and the cancellation flag
+CHECK_EVERY = 32
+
+class Budget:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    """
+        time_left:   wall-clock seconds from start(), or None for no deadline
+        node_limit:  nodes from start(), or None for no limit
+        cancelEvent: an object with set() and is_set(), a new
+                     threading.Event by default
+        checkEvery:  nodes between two checks of the clock and the flag
+    """
+    def __init__ ( self, time_left = None, node_limit = None, cancelEvent = None, checkEvery = CHECK_EVERY ):
+        self.time_left = time_left
+        self.node_limit = node_limit
+        self.cancelEvent = threading.Event() if cancelEvent is None else cancelEvent
+        self.checkEvery = max( 1, checkEvery )
+
+        self.deadline = float( "inf" )
+        self.maxNodes = None
+        self.started = False
+
+    # ==================================================================
+    # Cancellation
+    # ==================================================================
+
+    # Asks the search to stop at its next check; safe to call from any thread
+    def cancel ( self ):
+        self.cancelEvent.set()
+
+    def isCancelled ( self ):
+        return self.cancelEvent.is_set()
+
+    # ==================================================================
+    # Checks
+    # ==================================================================
+
+    """
+        Starts the clock and the node count on the first call. Later calls,
+        such as the runs of a restarting search, share the same deadline
+        and node limit.
+
+        Return: the node count of the first check, which is the next node
+    """
+    def start ( self, nodes ):
+        if not self.started:
+            self.started = True
+            if self.time_left is not None:
+                self.deadline = time.monotonic() + self.time_left
+            if self.node_limit is not None:
+                self.maxNodes = nodes + self.node_limit
+        return nodes + 1
+
+    # Node count of the next check, never past the node limit
+    def nextCheck ( self, nodes ):
+        due = nodes + self.checkEvery
+        if self.maxNodes is not None and due > self.maxNodes + 1:
+            due = self.maxNodes + 1
+        return due
+
+    """
+        Checks the budget at the given node count.
+
+        Return: CANCELLED, TIMEOUT (deadline or node limit reached), or
+                None if the search may go on
+    """
+    def check ( self, nodes ):
+        if self.cancelEvent.is_set():
+            return CANCELLED
+        if self.maxNodes is not None and nodes > self.maxNodes:
+            return TIMEOUT
+        if time.monotonic() > self.deadline:
+            return TIMEOUT
+        return None
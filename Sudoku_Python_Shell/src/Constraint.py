@@ -7,19 +7,68 @@ import Variable
 
 class Constraint:
 
+    __slots__ = ( "id", "vars", "varIds", "valueCounts", "criticalQueue" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
     def __init__ ( self ):
+        # Dense index given by ConstraintNetwork.addConstraint, -1 until then
+        self.id = -1
+
         self.vars = []
 
+        # Ids of the variables in vars, for contains
+        self.varIds = set()
+
+        # valueCounts[d] is the number of variables whose domain still holds
+        # d. Only maintained once enableValueCounts has been called.
+        self.valueCounts = None
+        self.criticalQueue = None
+
     # ==================================================================
     # Modifiers
     # ==================================================================
 
     def addVariable ( self, v ):
         self.vars.append( v )
+        self.varIds.add( v.id )
+
+    """
+        Starts keeping valueCounts for values 1..numValues. The constraint
+        listens to its variables, so the counts follow every domain change,
+        including the restores done by Trail.undo. Whenever a count drops
+        to one or zero, (self, value) is appended to criticalQueue.
+    """
+    def enableValueCounts ( self, numValues, criticalQueue ):
+        counts = [ 0 ] * ( numValues + 1 )
+        for v in self.vars:
+            for value in v.getValues():
+                counts[value] += 1
+            v.listeners.append( self )
+
+        self.valueCounts = counts
+        self.criticalQueue = criticalQueue
+
+    def variableChanged ( self, v, oldBits, wasAssigned ):
+        newBits = v.domain.bits
+        counts = self.valueCounts
+
+        removed = oldBits & ~newBits
+        while removed:
+            low = removed & -removed
+            removed ^= low
+            value = low.bit_length() - 1
+            counts[value] -= 1
+            if counts[value] <= 1:
+                self.criticalQueue.append( ( self, value ) )
+
+        added = newBits & ~oldBits
+        while added:
+            low = added & -added
+            added ^= low
+            counts[low.bit_length() - 1] += 1
 
     # ==================================================================
     # Accessors
@@ -28,9 +77,18 @@ class Constraint:
     def size ( self ):
         return len(self.vars)
 
-    # Returns true if v is in the constraint, false otherwise
+    # Returns the first variable whose domain holds value, or None
+    def findValue ( self, value ):
+        for var in self.vars:
+            if var.getDomain().contains( value ):
+                return var
+
+        return None
+
+    # Returns true if v is in the constraint, false otherwise. Compares ids,
+    # so the variables must have been added to the network first.
     def contains ( self, v ):
-        return v in self.vars
+        return v.id in self.varIds
 
     # Returns whether or not the a variable in the constraint has been modified
     def isModified ( self ):
@@ -42,16 +100,15 @@ class Constraint:
 
     # Returns true if constraint is consistent, false otherwise
     def isConsistent ( self ):
+        seen = 0
         for var in self.vars:
             if not var.isAssigned():
                 continue
 
-            for otherVar in self.vars:
-                if var == otherVar:
-                    continue
-
-                if otherVar.isAssigned() and otherVar.getAssignment() == var.getAssignment():
-                    return False
+            bit = var.getDomain().bits
+            if seen & bit:
+                return False
+            seen |= bit
 
         return True
 
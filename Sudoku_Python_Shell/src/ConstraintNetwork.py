@@ -17,6 +17,11 @@ class ConstraintNetwork:
         self.constraints = []
         self.variables = []
 
+        # Per-variable indexes by variable id, built as constraints are
+        # added so that neighbor and constraint lookups never rescan the network
+        self.neighbors = []
+        self.varConstraints = []
+
         if sboard != None:
             board = sboard.board
             temp = []
@@ -82,13 +87,44 @@ class ConstraintNetwork:
     # Modifiers
     # ==================================================================
 
+    # Ids are positions in the lists, so membership is an index check
     def addConstraint ( self, c ):
-        if c not in self.constraints:
+        if not self.hasConstraint( c ):
+            c.id = len( self.constraints )
             self.constraints.append( c )
+            self.indexConstraint( c )
 
     def addVariable ( self, v ):
-        if v not in self.variables:
+        if not self.hasVariable( v ):
+            v.id = len( self.variables )
             self.variables.append( v )
+            self.neighbors.append( () )
+            self.varConstraints.append( [] )
+
+    def hasVariable ( self, v ):
+        return 0 <= v.id < len( self.variables ) and self.variables[v.id] is v
+
+    def hasConstraint ( self, c ):
+        return 0 <= c.id < len( self.constraints ) and self.constraints[c.id] is c
+
+    # Records c in the peer and constraint indexes of every variable it
+    # holds, adding variables the network does not have yet
+    def indexConstraint ( self, c ):
+        c.varIds = set()
+        for v in c.vars:
+            if not self.hasVariable( v ):
+                self.addVariable( v )
+            c.varIds.add( v.id )
+
+            self.varConstraints[v.id].append( c )
+
+            peers = list( self.neighbors[v.id] )
+            seen = set( peers )
+            for x in c.vars:
+                if x is not v and x not in seen:
+                    seen.add( x )
+                    peers.append( x )
+            self.neighbors[v.id] = tuple( peers )
 
     # ==================================================================
     # Accessors
@@ -102,15 +138,7 @@ class ConstraintNetwork:
 
     # Returns all variables that share a constraint with v
     def getNeighborsOfVariable ( self, v ):
-        neighbors = set()
-
-        for c in self.constraints:
-            if c.contains( v ):
-                for x in c.vars:
-                    neighbors.add( x )
-
-        neighbors.remove( v )
-        return list( neighbors )
+        return self.neighbors[v.id]
 
     # Returns true is every constraint is consistent
     def isConsistent ( self ):
@@ -126,11 +154,7 @@ class ConstraintNetwork:
             @param v variable to check
             @return list of constraints that contains v
         """
-        outList = []
-        for c in self.constraints:
-            if c.contains( v ):
-                outList.append( c )
-        return outList
+        return self.varConstraints[v.id]
 
     """
         Returns the constraints that contain variables whose domains were
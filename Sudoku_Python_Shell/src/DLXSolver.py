@@ -0,0 +1,221 @@
+import Budget
+import SudokuBoard
+
+"""
+    Exact cover solver for Sudoku using Knuth's Algorithm X with Dancing
+    Links. Works on any p x q board and offers the same solve /
+    hassolution / getSolution interface as BTSolver.
+
+    The cover matrix has one column per constraint (each cell filled,
+    and each value once per row, column and block) and one row per
+    candidate (row, col, value). Nodes live in flat lists; node 0 is the
+    root and nodes 1..4N^2 are the column headers.
+"""
+
+class DLXSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, gb ):
+        self.gameboard = gb
+        self.hassolution = False
+        self.nodes = 0
+        self.solution = None
+
+        # How the last solve ended, a Budget status
+        self.status = None
+
+        p = gb.p
+        q = gb.q
+        N = gb.N
+        numCols = 4 * N * N
+
+        # Column headers, linked in a ring through the root
+        self.L = [ i - 1 for i in range( numCols + 1 ) ]
+        self.R = [ i + 1 for i in range( numCols + 1 ) ]
+        self.L[0] = numCols
+        self.R[numCols] = 0
+        self.U = list( range( numCols + 1 ) )
+        self.D = list( range( numCols + 1 ) )
+        self.C = list( range( numCols + 1 ) )
+        self.S = [ 0 ] * ( numCols + 1 )
+
+        # Candidate (row, col, value) of every matrix row, by node
+        self.rowOf = [ None ] * ( numCols + 1 )
+
+        givens = []
+        for r in range( N ):
+            for c in range( N ):
+                b = ( r // p ) * p + c // q
+                value = gb.board[r][c]
+                for d in ( range( 1, N + 1 ) if value == 0 else ( value, ) ):
+                    first = self.addRow( ( r, c, d ), (
+                        1 + r * N + c,
+                        1 + N * N + r * N + d - 1,
+                        1 + 2 * N * N + c * N + d - 1,
+                        1 + 3 * N * N + b * N + d - 1 ) )
+                    if value != 0:
+                        givens.append( first )
+
+        self.consistent = self.coverGivens( givens )
+
+    # Appends a matrix row with a node in each of the given columns
+    def addRow ( self, candidate, columns ):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        first = len( C )
+        for k, col in enumerate( columns ):
+            node = first + k
+            L.append( first + ( k - 1 ) % len( columns ) )
+            R.append( first + ( k + 1 ) % len( columns ) )
+            U.append( U[col] )
+            D.append( col )
+            C.append( col )
+            D[U[col]] = node
+            U[col] = node
+            S[col] += 1
+            self.rowOf.append( candidate )
+        return first
+
+    # Selects the rows of the given values; false if two givens clash
+    def coverGivens ( self, givens ):
+        active = [ True ] * len( self.S )
+        for r in givens:
+            j = r
+            while True:
+                if not active[self.C[j]]:
+                    return False
+                j = self.R[j]
+                if j == r:
+                    break
+
+            j = r
+            while True:
+                active[self.C[j]] = False
+                self.cover( self.C[j] )
+                j = self.R[j]
+                if j == r:
+                    break
+        return True
+
+    # ==================================================================
+    # Dancing Links
+    # ==================================================================
+
+    def cover ( self, c ):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover ( self, c ):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    """
+        Algorithm X with an explicit stack of selected rows. Always
+        branches on the column with the fewest remaining rows.
+
+        time_left:  wall-clock seconds the search may run for
+        node_limit: maximum number of rows to select, or None
+        budget:     a Budget to use instead of time_left and node_limit
+
+        Return: 0 once the search is over (see hassolution), or -1 if it
+                was stopped first. status tells which.
+    """
+    def solve ( self, time_left=600, node_limit=None, budget=None ):
+        if self.hassolution:
+            self.status = Budget.SOLVED
+            return 0
+        if not self.consistent:
+            self.status = Budget.UNSAT
+            return 0
+
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+        checkAt = budget.start( self.nodes )
+        R, D, C, S = self.R, self.D, self.C, self.S
+        cover, uncover = self.cover, self.uncover
+
+        path = []
+        while True:
+            if R[0] == 0:
+                self.hassolution = True
+                self.solution = [ self.rowOf[r] for r in path ]
+                self.status = Budget.SOLVED
+                return 0
+
+            # Choose the column with the fewest rows
+            c = R[0]
+            best = S[c]
+            j = R[c]
+            while j != 0 and best > 1:
+                if S[j] < best:
+                    c = j
+                    best = S[j]
+                j = R[j]
+
+            cover( c )
+            r = D[c]
+
+            # Column exhausted: unselect rows until one has an untried sibling
+            while r == c:
+                uncover( c )
+                if not path:
+                    self.status = Budget.UNSAT
+                    return 0
+
+                r = path.pop()
+                c = C[r]
+                j = self.L[r]
+                while j != r:
+                    uncover( C[j] )
+                    j = self.L[j]
+                r = D[r]
+
+            self.nodes += 1
+            if self.nodes >= checkAt:
+                stop = budget.check( self.nodes )
+                if stop is not None:
+                    # The refused node is not visited, so it is not counted
+                    self.nodes -= 1
+                    self.status = stop
+                    return -1
+                checkAt = budget.nextCheck( self.nodes )
+
+            path.append( r )
+            j = R[r]
+            while j != r:
+                cover( C[j] )
+                j = R[j]
+
+    def getSolution ( self ):
+        gb = self.gameboard
+        board = [ row[:] for row in gb.board ]
+        if self.solution is not None:
+            for r, c, d in self.solution:
+                board[r][c] = d
+        return SudokuBoard.SudokuBoard( gb.p, gb.q, board = board )
@@ -1,21 +1,34 @@
 """
     Represents the domain of a variable, i.e. the possible values that each
     variable may assign.
+
+    The values are stored as a bitset: value d is in the domain when bit d
+    of self.bits is set. Odometer boards go up to 36x36, so every domain
+    fits in a single 64-bit machine int.
 """
 
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount ( n ):
+        return bin( n ).count( "1" )
+
 class Domain:
 
+    __slots__ = ( "bits", "modified" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
     def __init__ ( self, value_or_values ):
-        self.values = []
+        self.bits = 0
         if type( value_or_values ) is int:
-            self.values.append( value_or_values )
+            self.bits = 1 << value_or_values
 
         else:
-            self.values = value_or_values
+            for v in value_or_values:
+                self.bits |= 1 << v
 
         self.modified = False
 
@@ -26,17 +39,38 @@ class Domain:
     # Accessors
     # ==================================================================
 
+    # Returns the values of the domain in ascending order
+    @property
+    def values ( self ):
+        output = []
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            output.append( low.bit_length() - 1 )
+            bits ^= low
+        return output
+
+    @values.setter
+    def values ( self, values ):
+        self.bits = 0
+        for v in values:
+            self.bits |= 1 << v
+
     # Checks if value exists within the domain
     def contains ( self, v ):
-        return v in self.values
+        return ( self.bits >> v ) & 1 == 1
 
     # Returns number of values in the domain
     def size ( self ):
-        return len(self.values)
+        return popcount( self.bits )
 
     # Returns true if no values are contained in the domain
     def isEmpty ( self ):
-        return not self.values
+        return self.bits == 0
+
+    # Returns the smallest value in the domain, or 0 if it is empty
+    def first ( self ):
+        return ( self.bits & -self.bits ).bit_length() - 1 if self.bits else 0
 
     # Returns whether or not the domain has been modified
     def isModified ( self ):
@@ -48,19 +82,26 @@ class Domain:
 
     # Adds a value to the domain
     def add ( self, num ):
-        if num not in self.values:
-            self.values.append( num )
+        self.bits |= 1 << num
 
     # Remove a value from the domain
     def remove ( self, num ):
-        if num in self.values:
+        bit = 1 << num
+        if self.bits & bit:
             self.modified = True
-            self.values.remove( num )
+            self.bits ^= bit
             return True
 
         else:
             return False
 
+    # Reduces the domain to the single value num
+    def assign ( self, num ):
+        bits = 1 << num
+        if self.bits != bits:
+            self.bits = bits
+            self.modified = True
+
     # Sets the modified flag
     def setModified ( self, modified ):
         self.modified = modified
@@ -70,13 +111,4 @@ class Domain:
     # ==================================================================
 
     def __str__ ( self ):
-        output = "{"
-        for i in range(len(self.values) - 1):
-            output += str(self.values[i]) + ", "
-        try:
-            output += str(self.values[-1])
-        except:
-            pass
-
-        output += "}"
-        return output
+        return "{" + ", ".join( str( v ) for v in self.values ) + "}"
@@ -0,0 +1,162 @@
+import time
+
+"""
+    Opt-in profiling of the BTSolver hot path.
+
+    attach() replaces the solver's phase methods (and its trail's undo) on
+    those instances with timed wrappers. A solver without instrumentation
+    keeps its plain methods and pays nothing. For each phase it records
+    call counts and cumulative time. It also records the deepest decision
+    level, the nodes searched per second, and the number of domain changes
+    made by propagation (trail pushes inside checkConsistency).
+"""
+
+class Instrumentation:
+
+    PHASES = [ "selectNextVariable", "getNextValues", "checkConsistency", "undo" ]
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self ):
+        self.calls = dict.fromkeys( Instrumentation.PHASES, 0 )
+        self.time = dict.fromkeys( Instrumentation.PHASES, 0.0 )
+        self.maxDepth = 0
+        self.removals = 0
+        self.nodes = 0
+        self.solveTime = 0.0
+
+    # Rebuilds an Instrumentation from the dictionary made by report()
+    @staticmethod
+    def fromReport ( report ):
+        inst = Instrumentation()
+        inst.merge( report )
+        return inst
+
+    # ==================================================================
+    # Attaching
+    # ==================================================================
+
+    def attach ( self, solver ):
+        self.wrap( solver, "selectNextVariable" )
+        self.wrap( solver, "getNextValues" )
+        self.wrap( solver.trail, "undo" )
+
+        trail = solver.trail
+        check = solver.checkConsistency
+        clock = time.perf_counter
+        def checkConsistency ( ):
+            depth = len( trail.trailMarker )
+            if depth > self.maxDepth:
+                self.maxDepth = depth
+            pushes = trail.numPush
+            start = clock()
+            try:
+                return check()
+            finally:
+                self.time["checkConsistency"] += clock() - start
+                self.calls["checkConsistency"] += 1
+                self.removals += trail.numPush - pushes
+        solver.checkConsistency = checkConsistency
+
+        self.wrapSearch( solver, "solve" )
+        self.wrapSearch( solver, "countSolutions" )
+        self.wrapSearch( solver, "solveWithRestarts" )
+        self.wrapEnumeration( solver, "solutions" )
+
+        solver.instrumentation = self
+
+    # Replaces a search entry point with a wrapper that adds up its time and nodes
+    def wrapSearch ( self, solver, name ):
+        search = getattr( solver, name )
+        clock = time.perf_counter
+        def timedSearch ( *args, **kwargs ):
+            nodes = solver.nodes
+            start = clock()
+            try:
+                return search( *args, **kwargs )
+            finally:
+                self.solveTime += clock() - start
+                self.nodes += solver.nodes - nodes
+        setattr( solver, name, timedSearch )
+
+    # Like wrapSearch for a generator entry point: only the time spent
+    # producing each solution counts, not the time the caller holds it
+    def wrapEnumeration ( self, solver, name ):
+        generate = getattr( solver, name )
+        clock = time.perf_counter
+        def timedEnumeration ( *args, **kwargs ):
+            found = generate( *args, **kwargs )
+            try:
+                while True:
+                    nodes = solver.nodes
+                    start = clock()
+                    try:
+                        board = next( found )
+                    except StopIteration:
+                        return
+                    finally:
+                        self.solveTime += clock() - start
+                        self.nodes += solver.nodes - nodes
+                    yield board
+            finally:
+                nodes = solver.nodes
+                start = clock()
+                found.close()
+                self.solveTime += clock() - start
+                self.nodes += solver.nodes - nodes
+        setattr( solver, name, timedEnumeration )
+
+    # Replaces owner.name with a wrapper that counts and times its calls
+    def wrap ( self, owner, name ):
+        original = getattr( owner, name )
+        calls = self.calls
+        spent = self.time
+        clock = time.perf_counter
+        def timed ( *args ):
+            start = clock()
+            try:
+                return original( *args )
+            finally:
+                spent[name] += clock() - start
+                calls[name] += 1
+        setattr( owner, name, timed )
+
+    # ==================================================================
+    # Reporting
+    # ==================================================================
+
+    def nodesPerSecond ( self ):
+        return self.nodes / self.solveTime if self.solveTime > 0 else 0.0
+
+    def report ( self ):
+        return {
+            "phases": { phase : { "calls": self.calls[phase], "time": self.time[phase] }
+                        for phase in Instrumentation.PHASES },
+            "maxDepth": self.maxDepth,
+            "nodes": self.nodes,
+            "solveTime": self.solveTime,
+            "nodesPerSecond": self.nodesPerSecond(),
+            "propagationRemovals": self.removals,
+        }
+
+    # Adds the counts of another report, e.g. from a worker process
+    def merge ( self, report ):
+        for phase, entry in report["phases"].items():
+            self.calls[phase] += entry["calls"]
+            self.time[phase] += entry["time"]
+        self.maxDepth = max( self.maxDepth, report["maxDepth"] )
+        self.nodes += report["nodes"]
+        self.solveTime += report["solveTime"]
+        self.removals += report["propagationRemovals"]
+
+    def __str__ ( self ):
+        output = "{:<20}{:>12}{:>14}\n".format( "Phase", "Calls", "Time (s)" )
+        for phase in Instrumentation.PHASES:
+            output += "{:<20}{:>12}{:>14.4f}\n".format( phase, self.calls[phase], self.time[phase] )
+        output += "Max Depth: " + str(self.maxDepth) + "\n"
+        output += "Nodes: " + str(self.nodes) + "\n"
+        output += "Nodes/s: " + "{:.1f}".format( self.nodesPerSecond() ) + "\n"
+        output += "Propagation Removals: " + str(self.removals)
+        return output
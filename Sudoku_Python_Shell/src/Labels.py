@@ -0,0 +1,47 @@
+import NumpySolver
+import Restarts
+
+"""
+    Short names for the solver options, shared by Main, the portfolio, the
+    solve server and the benchmarks. A label joins names with "+", such as
+    MRV+LCV+FC, MAD+NOR+LUBY, or an engine such as DLX on its own.
+"""
+
+VAR_HEURISTICS = { "MRV" : "MinimumRemainingValue", "MAD" : "MRVwithTieBreaker" }
+VAL_HEURISTICS = { "LCV" : "LeastConstrainingValue" }
+CONSISTENCY_CHECKS = { "FC" : "forwardChecking", "IFC" : "incrementalForwardChecking",
+                       "NOR" : "norvigCheck", "AC3" : "arcConsistency" }
+RESTART_SCHEDULES = { "LUBY" : Restarts.LUBY, "GEOM" : Restarts.GEOMETRIC }
+ENGINES = [ "DLX", "NUMPY" ]
+
+"""
+    Turns a label such as MAD+LCV+NOR+LUBY into a solver configuration: a
+    dictionary with the label, val_sh, var_sh, cc, restarts and engine,
+    each "" when the label does not set it.
+
+    engines: whether DLX and NUMPY are accepted, False for callers that
+             only run the backtracking solver
+"""
+def parseMember ( label, engines = True ):
+    member = { "label": label, "val_sh": "", "var_sh": "", "cc": "", "restarts": "", "engine": "" }
+    for name in label.split( "+" ):
+        if name in VAR_HEURISTICS:
+            member["var_sh"] = VAR_HEURISTICS[name]
+        elif name in VAL_HEURISTICS:
+            member["val_sh"] = VAL_HEURISTICS[name]
+        elif name in CONSISTENCY_CHECKS:
+            member["cc"] = CONSISTENCY_CHECKS[name]
+        elif name in RESTART_SCHEDULES:
+            member["restarts"] = RESTART_SCHEDULES[name]
+        elif name in ENGINES:
+            member["engine"] = name
+        else:
+            raise ValueError( "Unknown heuristic or check: " + name )
+
+    if member["engine"] != "" and not engines:
+        raise ValueError( member["engine"] + " is not supported here, only backtracking options are" )
+    if member["engine"] != "" and label != member["engine"]:
+        raise ValueError( member["engine"] + " cannot be combined with heuristics in " + label )
+    if member["engine"] == "NUMPY" and not NumpySolver.NumpySolver.available():
+        raise ValueError( "The NUMPY engine requires numpy to be installed" )
+    return member
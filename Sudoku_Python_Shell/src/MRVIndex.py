@@ -0,0 +1,162 @@
+import Domain
+
+"""
+    Bucket queue over the unassigned variables of a ConstraintNetwork,
+    keyed by domain size, for the MRV heuristics.
+
+    The index registers itself as a listener on every variable, so it is
+    updated whenever a domain shrinks, a variable is assigned, or
+    Trail.undo restores an earlier state. It also keeps, for each
+    variable, the number of unassigned neighbors (its degree for the MAD
+    tie-breaker). That count changes only when a neighbor is assigned or
+    unassigned.
+
+    Buckets are bitsets of variable ids, which are positions in
+    network.variables, so ties resolve to the first variable in board order,
+    just like a linear scan would, and that variable is the lowest set bit.
+    Once the MAD ties are first asked for, each bucket is also split by
+    degree into tiers, so those ties are one bitset too. No lookup sorts
+    or scans the variables of a bucket.
+"""
+
+# Returns the position of the n-th lowest set bit of bits, counting from 0
+def nthBit ( bits, n ):
+    lo, hi = 0, bits.bit_length()
+    while hi - lo > 1:
+        mid = ( lo + hi ) // 2
+        if Domain.popcount( bits & ( ( 1 << mid ) - 1 ) ) > n:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+class MRVIndex:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, network ):
+        self.network = network
+        self.variables = network.getVariables()
+
+        maxSize = max( [ v.size() for v in self.variables ] + [ 0 ] )
+        self.buckets = [ 0 ] * ( maxSize + 1 )
+        self.low = 0
+
+        # Each variable's bit and its complement, and the bucket bitsets
+        # split by degree, built by getMRVwithTieBreaker
+        self.bits = [ 1 << i for i in range( len( self.variables ) ) ]
+        self.masks = [ ~bit for bit in self.bits ]
+        self.tiers = None
+
+        self.degree = [ 0 ] * len( self.variables )
+        for i, v in enumerate( self.variables ):
+            if not v.isAssigned():
+                self.buckets[v.size()] |= self.bits[i]
+            self.degree[i] = sum( 1 for n in network.getNeighborsOfVariable( v ) if not n.isAssigned() )
+            v.listeners.append( self )
+
+    # Stops tracking the network's variables
+    def detach ( self ):
+        for v in self.variables:
+            v.listeners.remove( self )
+
+    # ==================================================================
+    # Listener
+    # ==================================================================
+
+    def variableChanged ( self, v, oldBits, wasAssigned ):
+        i = v.id
+        assigned = v.isAssigned()
+        tiers = self.tiers
+
+        if not wasAssigned:
+            size = Domain.popcount( oldBits )
+            self.buckets[size] &= self.masks[i]
+            if tiers is not None:
+                tiers[size][self.degree[i]] &= self.masks[i]
+        if not assigned:
+            size = v.size()
+            self.buckets[size] |= self.bits[i]
+            if tiers is not None:
+                tiers[size][self.degree[i]] |= self.bits[i]
+            if size < self.low:
+                self.low = size
+
+        if wasAssigned != assigned:
+            delta = -1 if assigned else 1
+            degree = self.degree
+            if tiers is None:
+                for n in self.network.getNeighborsOfVariable( v ):
+                    degree[n.id] += delta
+                return
+
+            # Move each unassigned neighbor to the tier of its new degree
+            popcount = Domain.popcount
+            bits = self.bits
+            masks = self.masks
+            for n in self.network.getNeighborsOfVariable( v ):
+                j = n.id
+                d = degree[j]
+                degree[j] = d + delta
+                if not n.assigned:
+                    tier = tiers[popcount( n.domain.bits )]
+                    tier[d] &= masks[j]
+                    tier[d + delta] |= bits[j]
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Returns the size of the smallest non-empty bucket, or None
+    def smallestSize ( self ):
+        buckets = self.buckets
+        for size in range( self.low, len( buckets ) ):
+            if buckets[size]:
+                self.low = size
+                return size
+        self.low = len( buckets )
+        return None
+
+    # Returns the first unassigned variable with the smallest domain, or a
+    # random one of them when given a random.Random, or None
+    def getMRV ( self, rng = None ):
+        size = self.smallestSize()
+        if size is None:
+            return None
+        bits = self.buckets[size]
+        if rng is not None:
+            return self.variables[nthBit( bits, rng.randrange( Domain.popcount( bits ) ) )]
+        return self.variables[( bits & -bits ).bit_length() - 1]
+
+    # Returns the variables tied for smallest domain with the most unassigned neighbors
+    def getMRVwithTieBreaker ( self ):
+        size = self.smallestSize()
+        if size is None:
+            return []
+
+        if self.tiers is None:
+            self.buildTiers()
+        tiers = self.tiers[size]
+        degree = len( tiers ) - 1
+        while not tiers[degree]:
+            degree -= 1
+
+        ties = []
+        bits = tiers[degree]
+        while bits:
+            low = bits & -bits
+            ties.append( self.variables[low.bit_length() - 1] )
+            bits ^= low
+        return ties
+
+    # Splits every bucket by the degree of its variables
+    def buildTiers ( self ):
+        maxDegree = max( [ len( self.network.getNeighborsOfVariable( v ) ) for v in self.variables ] + [ 0 ] )
+        self.tiers = [ [ 0 ] * ( maxDegree + 1 ) for bits in self.buckets ]
+        for size, bits in enumerate( self.buckets ):
+            while bits:
+                low = bits & -bits
+                self.tiers[size][self.degree[low.bit_length() - 1]] |= low
+                bits ^= low
@@ -3,10 +3,22 @@
 import sys
 import os
 import math
+import itertools
+import collections
+import json
+import multiprocessing
 import SudokuBoard
 import Constraint
 import ConstraintNetwork
+import BinaryBoards
 import BTSolver
+import Budget
+import DLXSolver
+import Instrumentation
+import Labels
+import NumpySolver
+import Portfolio
+import SolutionCache
 import Trail
 import time
 
@@ -15,6 +27,302 @@ import time
     command line and properly starting the backtrack solver.
 """
 
+# Consistency checks that must run once before the search starts
+PROPAGATING_CHECKS = ["forwardChecking","incrementalForwardChecking","norvigCheck","arcConsistency","tournCC"]
+
+# Engines other than the backtracking CSP solver, which report nodes instead of trail stats
+ENGINE_NAMES = { "DLX" : "Dancing Links", "NUMPY" : "NumPy" }
+
+def printStats ( config, pushes, backtracks, nodes ):
+    if config["portfolio"]:
+        print( "Portfolio: " + " ".join( config["portfolio"] ) )
+        print( "Trail Pushes: " + str(pushes) )
+        print( "Backtracks: " + str(backtracks) )
+        print( "Nodes Visited: " + str(nodes) )
+        return
+
+    if config["engine"] in ENGINE_NAMES:
+        print( "Engine: " + ENGINE_NAMES[config["engine"]] )
+        print( "Nodes Visited: " + str(nodes) )
+        return
+
+    cc = config["cc"]
+    print( "Consistency Check: " + ( cc if cc != "" else "assignmentsCheck" ) )
+    print( "Trail Pushes: " + str(pushes) )
+    print( "Backtracks: " + str(backtracks) )
+
+# Prints the number of restarts when searching with a restart schedule
+def printRestarts ( config, restarts ):
+    if config["restarts"] != "":
+        print( "Restarts: " + str(restarts) )
+
+# Prints how many solutions the counting mode found, which stops at the limit
+def printCount ( config, count ):
+    limit = config["count"]
+    print( "Solutions Counted: " + str(count) + ( " (limit reached)" if count >= limit else "" ) )
+
+# Prints and/or writes the instrumentation report when it was asked for
+def reportInstrumentation ( config, instrumentation ):
+    if instrumentation is None:
+        return
+
+    if config["stats"]:
+        print( instrumentation )
+
+    if config["statsJson"] != "":
+        with open( config["statsJson"], "w" ) as f:
+            json.dump( instrumentation.report(), f, indent = 2 )
+
+# The solution cache of this process, built on first use from the configuration
+CACHE = None
+
+def getCache ( config ):
+    global CACHE
+    if config["cache"] <= 0 and config["cacheDir"] == "":
+        return None
+    if CACHE is None:
+        CACHE = SolutionCache.SolutionCache( max( 1, config["cache"] ), config["cacheDir"] or None, config["cacheBytes"] )
+    return CACHE
+
+# The push and undo counts of a solve. A portfolio's winner used its own
+# trail in another process and brings its counts back instead.
+def trailCounts ( solver, trail ):
+    if isinstance( solver, Portfolio.PortfolioSolver ):
+        return ( solver.pushes, solver.backtracks )
+    return ( trail.getPushCount(), trail.getUndoCount() )
+
+# Builds the solver the configuration asks for and runs it to completion
+def runSolver ( sudokudata, trail, config ):
+    if config["portfolio"]:
+        solver = Portfolio.PortfolioSolver( sudokudata, config["portfolio"], config["seed"] or 0 )
+        solver.solve()
+        return solver
+
+    if config["engine"] == "DLX":
+        solver = DLXSolver.DLXSolver( sudokudata )
+        solver.solve()
+        return solver
+
+    if config["engine"] == "NUMPY":
+        solver = NumpySolver.NumpySolver( sudokudata )
+        solver.solve()
+        return solver
+
+    solver = BTSolver.BTSolver( sudokudata, trail, config["val_sh"], config["var_sh"], config["cc"] )
+    if config["stats"] or config["statsJson"] != "":
+        solver.enableInstrumentation()
+    # A board the root propagation rejects has no solution to search for
+    if config["cc"] in PROPAGATING_CHECKS and not solver.checkConsistency():
+        solver.status = Budget.UNSAT
+        if config["count"] > 0:
+            solver.solutionCount = 0
+    elif config["count"] > 0:
+        solver.countSolutions( config["count"] )
+    elif config["restarts"] != "":
+        solver.solveWithRestarts( config["restarts"], config["seed"] or 0 )
+    else:
+        if config["seed"] is not None:
+            solver.randomize( config["seed"] )
+        solver.solve()
+    return solver
+
+"""
+    Solves the board, going through the solution cache when one is
+    configured. A cache hit skips the solver entirely.
+
+    Return: (solver or None on a cache hit, solution or None, cache status
+            "hit", "miss" or "skip", or None without a cache)
+"""
+def cachedSolve ( sudokudata, trail, config ):
+    cache = getCache( config )
+    status = None
+    if cache is not None:
+        status, solution = cache.lookup( sudokudata )
+        if solution is not None:
+            return ( None, solution, status )
+
+    solver = runSolver( sudokudata, trail, config )
+    solution = solver.getSolution() if solver.hassolution else None
+    if cache is not None and solution is not None:
+        cache.store( sudokudata, solution )
+    return ( solver, solution, status )
+
+# Solves a single board and prints it, its solution and the stats
+def solveSingle ( sudokudata, trail, config ):
+    print(sudokudata)
+
+    solver, solution, status = cachedSolve( sudokudata, trail, config )
+
+    if solution is not None:
+        print( solution )
+        if solver is None:
+            print( "Solution found in cache" )
+        else:
+            pushes, backtracks = trailCounts( solver, trail )
+            printStats( config, pushes, backtracks, solver.nodes )
+            printRestarts( config, getattr( solver, "restarts", 0 ) )
+        if config["count"] > 0:
+            printCount( config, solver.solutionCount )
+
+    else:
+        print( "Failed to find a solution" )
+
+    if config["portfolio"] and solver is not None:
+        print( solver )
+
+    reportInstrumentation( config, getattr( solver, "instrumentation", None ) )
+
+"""
+    Solves one board with its own trail. The board is either a file path
+    or an already parsed SudokuBoard. Used for directory and stream runs,
+    both in this process and in the worker processes of the -j mode.
+
+    Return: a dictionary with the board's name, whether it was solved, its
+            trail pushes, backtracks, nodes, seconds, instrumentation
+            report (or None), cache status (or None), number of
+            solutions counted (or None when not counting), restarts and
+            the winning portfolio member (or None)
+"""
+def solveBoard ( task ):
+    name, board, config = task
+
+    start = time.time()
+    trail = Trail.Trail()
+    if isinstance( board, SudokuBoard.SudokuBoard ):
+        sudokudata = board
+    else:
+        sudokudata = SudokuBoard.SudokuBoard( filepath=board )
+    solver, solution, status = cachedSolve( sudokudata, trail, config )
+    pushes, backtracks = trailCounts( solver, trail )
+
+    instrumentation = getattr( solver, "instrumentation", None )
+    return {
+        "name": name,
+        "solved": solution is not None,
+        "pushes": pushes,
+        "backtracks": backtracks,
+        "nodes": 0 if solver is None else solver.nodes,
+        "seconds": time.time() - start,
+        "instrumentation": None if instrumentation is None else instrumentation.report(),
+        "cache": status,
+        "solutions": getattr( solver, "solutionCount", None ),
+        "restarts": getattr( solver, "restarts", 0 ),
+        "winner": getattr( solver, "winner", None ),
+    }
+
+# Solves a list of tasks in a worker process
+def solveChunk ( chunk ):
+    return [ solveBoard( task ) for task in chunk ]
+
+"""
+    Solves every task, spreading them over a pool of jobs processes when
+    jobs > 1. Tasks are pulled from the iterable lazily, in chunks, and
+    only a window of a few chunks per process is submitted at a time, so
+    a streamed corpus is never held in memory all at once. The window is
+    refilled from this thread as results come back, so an error in a
+    worker is raised here instead of stalling the pool.
+"""
+def solveBoards ( tasks, jobs, chunksize = 8 ):
+    if jobs <= 1:
+        for task in tasks:
+            print ( "Running board: " + str(task[0]) )
+            yield solveBoard( task )
+        return
+
+    tasks = iter( tasks )
+    chunks = iter( lambda: list( itertools.islice( tasks, chunksize ) ), [] )
+
+    with multiprocessing.Pool( jobs ) as pool:
+        window = collections.deque( pool.apply_async( solveChunk, ( chunk, ) )
+                                    for chunk in itertools.islice( chunks, jobs * 4 ) )
+        while window:
+            results = window.popleft().get()
+            for chunk in itertools.islice( chunks, 1 ):
+                window.append( pool.apply_async( solveChunk, ( chunk, ) ) )
+            for result in results:
+                print ( "Running board: " + str(result["name"]) )
+                yield result
+
+# Solves a corpus of boards and prints the merged stats
+def solveCorpus ( tasks, jobs, config, chunksize = 8 ):
+    numSolutions = 0
+    pushes = 0
+    backtracks = 0
+    nodes = 0
+    solveTime = 0.0
+    instrumentation = None
+    cacheCounts = { "hit": 0, "miss": 0, "skip": 0 }
+    unique = 0
+    multiple = 0
+    restarts = 0
+    wins = dict.fromkeys( config["portfolio"], 0 )
+    start = time.time()
+    for result in solveBoards( tasks, jobs, chunksize ):
+        if result["solved"]:
+            numSolutions += 1;
+        pushes += result["pushes"]
+        backtracks += result["backtracks"]
+        nodes += result["nodes"]
+        solveTime += result["seconds"]
+        restarts += result["restarts"]
+        if result["winner"] is not None:
+            wins[result["winner"]] += 1
+        if result["instrumentation"] is not None:
+            if instrumentation is None:
+                instrumentation = Instrumentation.Instrumentation()
+            instrumentation.merge( result["instrumentation"] )
+        if result["cache"] is not None:
+            cacheCounts[result["cache"]] += 1
+        if result["solutions"] == 1:
+            unique += 1
+        elif result["solutions"] is not None and result["solutions"] > 1:
+            multiple += 1
+
+    print ( "Solutions Found: " + str(numSolutions) )
+    printStats( config, pushes, backtracks, nodes )
+    printRestarts( config, restarts )
+    for label in config["portfolio"]:
+        print ( "Portfolio Wins " + label + ": " + str(wins[label]) )
+    if config["count"] > 0:
+        print ( "Unique Solutions: " + str(unique) )
+        print ( "Multiple Solutions: " + str(multiple) )
+    print ( "Solve Time: " + "{:.3f}".format(solveTime) + "s" )
+    print ( "Wall Time: " + "{:.3f}".format(time.time() - start) + "s" )
+    if config["cache"] > 0 or config["cacheDir"] != "":
+        lookups = sum( cacheCounts.values() )
+        print ( "Cache Hits: " + str(cacheCounts["hit"]) )
+        print ( "Cache Misses: " + str(cacheCounts["miss"]) )
+        print ( "Cache Skipped: " + str(cacheCounts["skip"]) )
+        print ( "Cache Hit Rate: " + "{:.1%}".format( cacheCounts["hit"] / lookups if lookups else 0.0 ) )
+    reportInstrumentation( config, instrumentation )
+
+# Boards from stdin ("-"), a binary board file, or a text file read through a memory map
+def readBoardFile ( file ):
+    if file == "-":
+        return SudokuBoard.readBoards( sys.stdin )
+
+    path = os.path.abspath( file )
+    if BinaryBoards.isBinary( path ):
+        return iter( BinaryBoards.BoardReader( path ) )
+    return SudokuBoard.mapBoards( path )
+
+# Writes boards, which must all have the same shape, to a binary board file
+def writeBoards ( boards, path ):
+    writer = None
+    try:
+        for board in boards:
+            if writer is None:
+                writer = BinaryBoards.BoardWriter( path, board.p, board.q )
+            writer.write( board )
+    except ValueError as e:
+        print ( "[ERROR] " + str(e) )
+        return
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print ( "Wrote " + str(writer.count) + " boards to " + path )
+
 def main ( ):
     args = sys.argv
 
@@ -23,50 +331,148 @@ def main ( ):
     var_sh = "";
     val_sh = "";
     cc     = "";
+    engine = "";
+    jobs   = 1;
+    stats  = False;
+    statsJson = "";
+    cache  = 0;
+    cacheDir = "";
+    cacheBytes = 64 * 1024 * 1024;
+    count  = 0;
+    writeBinary = "";
+    restarts = "";
+    seed   = None;
+    portfolio = [];
 
-    for arg in [args[i] for i in range(1, len(args))]:
-        if arg == "MRV":
-            var_sh = "MinimumRemainingValue"
-
-        elif arg == "MAD":
-            var_sh = "MRVwithTieBreaker"
+    i = 1
+    while i < len(args):
+        arg = args[i]
 
-        elif arg == "LCV":
-            val_sh = "LeastConstrainingValue"
+        if arg in Labels.VAR_HEURISTICS:
+            var_sh = Labels.VAR_HEURISTICS[arg]
 
-        elif arg == "FC":
-            cc = "forwardChecking"
+        elif arg in Labels.VAL_HEURISTICS:
+            val_sh = Labels.VAL_HEURISTICS[arg]
 
-        elif arg == "NOR":
-            cc = "norvigCheck"
+        elif arg in Labels.CONSISTENCY_CHECKS:
+            cc = Labels.CONSISTENCY_CHECKS[arg]
 
         elif arg == "TOURN":
             var_sh = "tournVar"
             val_sh = "tournVal"
             cc     = "tournCC"
 
+        elif arg in Labels.ENGINES:
+            engine = arg
+
+        elif arg in Labels.RESTART_SCHEDULES:
+            restarts = Labels.RESTART_SCHEDULES[arg]
+
+        elif arg == "PORTFOLIO":
+            portfolio = list( Portfolio.DEFAULT_MEMBERS )
+
+        elif arg == "--portfolio" and i + 1 < len(args):
+            i += 1
+            portfolio = args[i].split( "," )
+
+        elif arg == "--stats":
+            stats = True
+
+        elif arg == "--stats-json" and i + 1 < len(args):
+            i += 1
+            statsJson = args[i]
+
+        elif arg in ( "--cache", "--cache-bytes", "--count", "--seed" ) and i + 1 < len(args):
+            i += 1
+            try:
+                if arg == "--cache":
+                    cache = int( args[i] )
+                elif arg == "--count":
+                    count = int( args[i] )
+                elif arg == "--seed":
+                    seed = int( args[i] )
+                else:
+                    cacheBytes = int( args[i] )
+            except ValueError:
+                print ( "[ERROR] " + arg + " expects a number." )
+                return
+
+        elif arg == "--write-binary" and i + 1 < len(args):
+            i += 1
+            writeBinary = args[i]
+
+        elif arg == "--cache-dir" and i + 1 < len(args):
+            i += 1
+            cacheDir = args[i]
+
+        elif arg == "-j" and i + 1 < len(args):
+            i += 1
+            try:
+                jobs = int( args[i] )
+            except ValueError:
+                print ( "[ERROR] -j expects a number of processes." )
+                return
+            if jobs <= 0:
+                jobs = os.cpu_count() or 1
+
         else:
             file = arg;
 
-    trail = Trail.Trail();
+        i += 1
 
-    if file == "":
-        sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7 )
-        print(sudokudata)
+    if engine == "NUMPY" and not NumpySolver.NumpySolver.available():
+        print ( "[ERROR] The NUMPY engine requires numpy to be installed." )
+        return
 
-        solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-        if cc in ["forwardChecking","norvigCheck","tournCC"]:
-            solver.checkConsistency()
-        solver.solve()
+    if count > 0 and engine != "":
+        print ( "[ERROR] --count needs the backtracking solver." )
+        return
 
-        if solver.hassolution:
-            print( solver.getSolution() )
-            print( "Trail Pushes: " + str(trail.getPushCount()) )
-            print( "Backtracks: " + str(trail.getUndoCount()) )
+    if portfolio:
+        try:
+            for label in portfolio:
+                Labels.parseMember( label )
+        except ValueError as e:
+            print ( "[ERROR] " + str(e) )
+            return
 
-        else:
-            print( "Failed to find a solution" )
+        # Each board starts its own member processes, which pool workers cannot do
+        if jobs > 1:
+            print ( "[ERROR] PORTFOLIO cannot be combined with -j." )
+            return
+
+        if var_sh != "" or val_sh != "" or cc != "" or engine != "" or restarts != "":
+            print ( "[ERROR] PORTFOLIO members are set with --portfolio, not with other options." )
+            return
+
+        if count > 0 or stats or statsJson != "":
+            print ( "[ERROR] PORTFOLIO cannot be combined with --count or --stats." )
+            return
+
+    if ( restarts != "" or seed is not None ) and engine != "":
+        print ( "[ERROR] Restarts and --seed need the backtracking solver." )
+        return
+
+    # Restarting would count the solutions found before a restart again
+    if count > 0 and restarts != "":
+        print ( "[ERROR] --count cannot be combined with restarts." )
+        return
+
+    # A cached solution says nothing about how many others there are
+    if count > 0 and ( cache > 0 or cacheDir != "" ):
+        print ( "[ERROR] --count cannot be combined with the solution cache." )
+        return
+
+    config = { "val_sh" : val_sh, "var_sh" : var_sh, "cc" : cc, "engine" : engine,
+               "stats" : stats, "statsJson" : statsJson,
+               "cache" : cache, "cacheDir" : cacheDir, "cacheBytes" : cacheBytes,
+               "count" : count, "restarts" : restarts, "seed" : seed,
+               "portfolio" : portfolio }
+    trail = Trail.Trail();
 
+    if file == "":
+        sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7 )
+        solveSingle( sudokudata, trail, config )
         return
 
     if os.path.isdir(file):
@@ -78,39 +484,43 @@ def main ( ):
             print ( "[ERROR] Failed to open directory." )
             return
 
-        numSolutions = 0
-        for f in listOfBoards:
-            print ( "Running board: " + str(f) )
-            sudokudata = SudokuBoard.SudokuBoard( filepath=os.path.join( file, f ) )
-
-            solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-            if cc in ["forwardChecking","norvigCheck","tournCC"]:
-                solver.checkConsistency()
-            solver.solve()
+        if writeBinary != "":
+            paths = ( os.path.join( file, f ) for f in sorted( listOfBoards ) )
+            writeBoards( ( SudokuBoard.SudokuBoard( filepath=path ) for path in paths ), writeBinary )
+            return
 
-            if solver.hassolution:
-                numSolutions += 1;
+        tasks = [ ( f, os.path.join( file, f ), config ) for f in listOfBoards ]
+        solveCorpus( tasks, jobs, config, max( 1, len(tasks) // ( jobs * 4 ) ) )
 
-        print ( "Solutions Found: " + str(numSolutions) )
-        print ( "Trail Pushes: " + str(trail.getPushCount()) )
-        print ( "Backtracks: "  + str(trail.getUndoCount()) )
+        return
 
+    # A file (or "-" for stdin) may hold any number of boards
+    try:
+        boards = readBoardFile( file )
+        sudokudata = next( boards, None )
+        second = None if sudokudata is None else next( boards, None )
+    except OSError:
+        print ( "[ERROR] Failed to open file." )
+        return
+    except ValueError as e:
+        print ( "[ERROR] " + str(e) )
         return
 
-    sudokudata =  SudokuBoard.SudokuBoard( filepath=os.path.abspath( file ) )
-    print(sudokudata)
+    if sudokudata is None:
+        print ( "[ERROR] No boards found." )
+        return
 
-    solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-    if cc in ["forwardChecking","norvigCheck","tournCC"]:
-        solver.checkConsistency()
-    solver.solve()
+    boards = itertools.chain( [ sudokudata ] if second is None else [ sudokudata, second ], boards )
+    if writeBinary != "":
+        writeBoards( boards, writeBinary )
+        return
 
-    if solver.hassolution:
-        print( solver.getSolution() )
-        print( "Trail Pushes: " + str(trail.getPushCount()) )
-        print( "Backtracks: " + str(trail.getUndoCount()) )
+    if second is not None:
+        tasks = ( ( file + "#" + str(n), board, config ) for n, board in enumerate( boards ) )
+        solveCorpus( tasks, jobs, config )
+        return
 
-    else:
-        print( "Failed to find a solution" )
+    solveSingle( sudokudata, trail, config )
 
-main()
+if __name__ == "__main__":
+    main()
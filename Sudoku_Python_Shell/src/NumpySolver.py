@@ -0,0 +1,201 @@
+import Budget
+import SudokuBoard
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+    Vectorized solver that keeps the board as an N x N integer NumPy array.
+
+    Candidates are bitmasks (bit d set when value d is still possible).
+    One pass over the array computes every row, column and block mask.
+    Naked and hidden singles are filled in with array operations, and the
+    MRV cell is an argmin over candidate popcounts. The search keeps a
+    stack of board copies, so backtracking just discards arrays.
+
+    NumPy is optional. Check NumpySolver.available() before constructing.
+"""
+
+class NumpySolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, gb ):
+        self.gameboard = gb
+        self.hassolution = False
+        self.nodes = 0
+        self.solution = None
+
+        # How the last solve ended, a Budget status
+        self.status = None
+
+        self.p = gb.p
+        self.q = gb.q
+        self.N = gb.N
+        self.grid = numpy.array( gb.board, dtype = numpy.int64 ).reshape( self.N, self.N )
+        self.full = sum( 1 << d for d in range( 1, self.N + 1 ) )
+        self.shifts = numpy.arange( 1, self.N + 1, dtype = numpy.int64 )
+
+        # Number of set bits in every byte value
+        self.popcount8 = numpy.array( [ bin( b ).count( "1" ) for b in range( 256 ) ], dtype = numpy.int64 )
+
+    @staticmethod
+    def available ( ):
+        return numpy is not None
+
+    # ==================================================================
+    # Vectorized Helpers
+    # ==================================================================
+
+    # Bit counts of every element of an int64 array
+    def popcount ( self, masks ):
+        masks = numpy.ascontiguousarray( masks, dtype = numpy.int64 )
+        return self.popcount8[ masks.view( numpy.uint8 ) ].reshape( masks.shape + ( 8, ) ).sum( axis = -1 )
+
+    # OR of the value bits of each row, column and block
+    def unitMasks ( self, grid ):
+        N, p, q = self.N, self.p, self.q
+        bits = numpy.where( grid > 0, numpy.left_shift( 1, grid ), 0 )
+        rows = numpy.bitwise_or.reduce( bits, axis = 1 )
+        cols = numpy.bitwise_or.reduce( bits, axis = 0 )
+        blocks = numpy.bitwise_or.reduce( numpy.bitwise_or.reduce( bits.reshape( N // p, p, N // q, q ), axis = 3 ), axis = 1 )
+        return rows, cols, blocks
+
+    # False if some row, column or block repeats a value
+    def isConsistent ( self, grid, rows, cols, blocks ):
+        N, p, q = self.N, self.p, self.q
+        filled = grid > 0
+        return ( numpy.array_equal( self.popcount( rows ), filled.sum( axis = 1 ) )
+             and numpy.array_equal( self.popcount( cols ), filled.sum( axis = 0 ) )
+             and numpy.array_equal( self.popcount( blocks ), filled.reshape( N // p, p, N // q, q ).sum( axis = ( 1, 3 ) ) ) )
+
+    """
+        Fills naked singles (cells with one candidate) and hidden singles
+        (values with one place left in a row, column or block) into grid,
+        in place, until none are left.
+
+        Return: (candidates, popcounts) of the resulting grid, or None if
+                it reached a contradiction
+    """
+    def propagate ( self, grid ):
+        N, p, q = self.N, self.p, self.q
+        while True:
+            rows, cols, blocks = self.unitMasks( grid )
+            if not self.isConsistent( grid, rows, cols, blocks ):
+                return None
+
+            used = rows[:, None] | cols[None, :] | numpy.repeat( numpy.repeat( blocks, p, axis = 0 ), q, axis = 1 )
+            empty = grid == 0
+            cand = numpy.where( empty, self.full & ~used, 0 )
+            pop = self.popcount( cand )
+
+            if ( empty & ( pop == 0 ) ).any():
+                return None
+
+            # planes[r, c, d-1] is 1 when d is a candidate of (r, c)
+            planes = ( cand[:, :, None] >> self.shifts ) & 1
+            rowCount = planes.sum( axis = 1 )
+            colCount = planes.sum( axis = 0 )
+            blockCount = planes.reshape( N // p, p, N // q, q, N ).sum( axis = ( 1, 3 ) )
+
+            # A value missing from a unit with no place left is a dead end
+            rowPlaced = ( rows[:, None] >> self.shifts ) & 1
+            colPlaced = ( cols[:, None] >> self.shifts ) & 1
+            blockPlaced = ( blocks[:, :, None] >> self.shifts ) & 1
+            if ( ( rowCount == 0 ) & ( rowPlaced == 0 ) ).any() \
+               or ( ( colCount == 0 ) & ( colPlaced == 0 ) ).any() \
+               or ( ( blockCount == 0 ) & ( blockPlaced == 0 ) ).any():
+                return None
+
+            blockOnly = numpy.repeat( numpy.repeat( blockCount == 1, p, axis = 0 ), q, axis = 1 )
+            hidden = ( planes == 1 ) & ( ( rowCount == 1 )[:, None, :] | ( colCount == 1 )[None, :, :] | blockOnly )
+            hiddenCount = hidden.sum( axis = 2 )
+            if ( hiddenCount > 1 ).any():
+                return None
+
+            naked = empty & ( pop == 1 )
+            hiddenCells = hiddenCount == 1
+            if not naked.any() and not hiddenCells.any():
+                return cand, pop
+
+            grid[naked] = numpy.log2( cand[naked] ).astype( numpy.int64 )
+            grid[hiddenCells] = numpy.argmax( hidden[hiddenCells], axis = 1 ) + 1
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    """
+        Depth-first search over board copies, branching on the empty cell
+        with the fewest candidates.
+
+        time_left:  wall-clock seconds the search may run for
+        node_limit: maximum number of boards to expand, or None
+        budget:     a Budget to use instead of time_left and node_limit
+
+        Return: 0 once the search is over (see hassolution), or -1 if it
+                was stopped first. status tells which.
+    """
+    def solve ( self, time_left=600, node_limit=None, budget=None ):
+        if self.hassolution:
+            self.status = Budget.SOLVED
+            return 0
+
+        if budget is None:
+            budget = Budget.Budget( time_left, node_limit )
+        checkAt = budget.start( self.nodes )
+
+        N = self.N
+        stack = [ self.grid.copy() ]
+        while stack:
+            self.nodes += 1
+            if self.nodes >= checkAt:
+                stop = budget.check( self.nodes )
+                if stop is not None:
+                    # The refused node is not visited, so it is not counted
+                    self.nodes -= 1
+                    self.status = stop
+                    return -1
+                checkAt = budget.nextCheck( self.nodes )
+
+            grid = stack.pop()
+            state = self.propagate( grid )
+            if state is None:
+                continue
+
+            cand, pop = state
+            empty = grid == 0
+            if not empty.any():
+                self.hassolution = True
+                self.solution = grid
+                self.status = Budget.SOLVED
+                return 0
+
+            cell = int( numpy.argmin( numpy.where( empty, pop, N + 1 ) ) )
+            r, c = divmod( cell, N )
+            bits = int( cand[r, c] )
+
+            # Push the largest value first so the smallest is tried first
+            for d in range( N, 0, -1 ):
+                if ( bits >> d ) & 1:
+                    child = grid.copy()
+                    child[r, c] = d
+                    stack.append( child )
+
+        self.status = Budget.UNSAT
+        return 0
+
+    # ==================================================================
+    # Sudoku Board Representation
+    # ==================================================================
+
+    def toSudokuBoard ( self ):
+        grid = self.solution if self.solution is not None else self.grid
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = grid.tolist() )
+
+    def getSolution ( self ):
+        return self.toSudokuBoard()
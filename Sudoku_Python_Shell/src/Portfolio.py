@@ -0,0 +1,184 @@
+import multiprocessing
+import queue
+import time
+import BTSolver
+import Budget
+import DLXSolver
+import Labels
+import NumpySolver
+import SudokuBoard
+import Trail
+
+"""
+    Portfolio solving: several solver configurations race on the same board,
+    each in its own process. The first to reach an answer (a solution, or
+    a proof that there is none) wins. The others are cancelled through a
+    shared event that their Budget reads every few nodes, and any that do
+    not stop within a short grace period are terminated.
+
+    Members are labels such as MRV+LCV+FC, MAD+NOR, MRV+NOR+LUBY or DLX.
+    PortfolioSolver offers the same solve / hassolution / getSolution
+    interface as the single solvers and records which member won.
+"""
+
+DEFAULT_MEMBERS = [ "MRV+LCV+FC", "MAD+NOR", "MRV+LCV+FC+LUBY" ]
+
+# Seconds the losers get to stop on their own before they are terminated
+CANCEL_GRACE = 0.25
+
+# ======================================================================
+# Member Process
+# ======================================================================
+
+"""
+    Runs one member on the board and puts a result dictionary on results:
+    the member's index, its Budget status, node, push, backtrack and
+    restart counts, seconds, and the solution's rows (or None).
+"""
+def runMember ( index, member, board, seed, time_left, cancelEvent, results ):
+    start = time.perf_counter()
+    budget = Budget.Budget( time_left, cancelEvent = cancelEvent )
+    trail = Trail.Trail()
+
+    if member["engine"] == "DLX":
+        solver = DLXSolver.DLXSolver( board )
+        solver.solve( budget = budget )
+    elif member["engine"] == "NUMPY":
+        solver = NumpySolver.NumpySolver( board )
+        solver.solve( budget = budget )
+    else:
+        solver = BTSolver.BTSolver( board, trail, member["val_sh"], member["var_sh"], member["cc"] )
+        if member["cc"] != "" and not solver.checkConsistency():
+            solver.status = Budget.UNSAT
+        elif member["restarts"] != "":
+            solver.solveWithRestarts( member["restarts"], seed + index, budget = budget )
+        else:
+            solver.solve( budget = budget )
+
+    results.put( {
+        "index": index,
+        "status": solver.status,
+        "nodes": solver.nodes,
+        "pushes": trail.getPushCount(),
+        "backtracks": trail.getUndoCount(),
+        "restarts": getattr( solver, "restarts", 0 ),
+        "seconds": time.perf_counter() - start,
+        "solution": solver.getSolution().board if solver.hassolution else None,
+    } )
+
+# ======================================================================
+# Portfolio Solver
+# ======================================================================
+
+class PortfolioSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, gb, labels = DEFAULT_MEMBERS, seed = 0 ):
+        self.gameboard = gb
+        self.members = [ Labels.parseMember( label ) for label in labels ]
+        self.seed = seed
+
+        self.hassolution = False
+        self.solution = None
+        self.status = None
+        self.solutionCount = None
+
+        # The winning member's label and counts, and every member's result
+        self.winner = None
+        self.nodes = 0
+        self.pushes = 0
+        self.backtracks = 0
+        self.restarts = 0
+        self.results = [ None ] * len( self.members )
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    """
+        Races the members until one of them finishes with an answer.
+
+        time_left: wall-clock seconds each member may run for
+
+        Return: 0 once a member has answered (see hassolution), or -1 if
+                every member ran out of time first
+    """
+    def solve ( self, time_left=600 ):
+        cancelEvent = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [ multiprocessing.Process( target = runMember, daemon = True,
+                                               args = ( i, member, self.gameboard, self.seed, time_left, cancelEvent, results ) )
+                      for i, member in enumerate( self.members ) ]
+        for process in processes:
+            process.start()
+
+        pending = set( range( len( processes ) ) )
+        giveUp = None
+        try:
+            while pending:
+                try:
+                    result = results.get( timeout = 0.05 )
+                except queue.Empty:
+                    # A member that died without reporting will never answer
+                    pending -= { i for i in pending if not processes[i].is_alive() and results.empty() }
+                    if giveUp is not None and time.monotonic() > giveUp:
+                        break
+                    continue
+
+                i = result["index"]
+                pending.discard( i )
+                self.results[i] = result
+                if self.winner is None and result["status"] in ( Budget.SOLVED, Budget.UNSAT ):
+                    self.win( i, result )
+                    cancelEvent.set()
+                    giveUp = time.monotonic() + CANCEL_GRACE
+        finally:
+            cancelEvent.set()
+            for process in processes:
+                process.join( CANCEL_GRACE if giveUp is None else max( 0.0, giveUp - time.monotonic() ) )
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+        for i in pending:
+            self.results[i] = { "index": i, "status": Budget.CANCELLED, "nodes": None, "pushes": None,
+                                "backtracks": None, "restarts": None, "seconds": None, "solution": None }
+
+        if self.winner is None:
+            self.status = Budget.TIMEOUT
+            return -1
+        return 0
+
+    # Takes the answer and counts of the member at index i
+    def win ( self, i, result ):
+        self.winner = self.members[i]["label"]
+        self.status = result["status"]
+        self.nodes = result["nodes"]
+        self.pushes = result["pushes"]
+        self.backtracks = result["backtracks"]
+        self.restarts = result["restarts"]
+        if result["solution"] is not None:
+            self.hassolution = True
+            self.solution = SudokuBoard.SudokuBoard( self.gameboard.p, self.gameboard.q, board = result["solution"] )
+
+    def getSolution ( self ):
+        return self.solution
+
+    # ==================================================================
+    # String Representation
+    # ==================================================================
+
+    def __str__ ( self ):
+        output = "Portfolio Winner: " + ( self.winner if self.winner is not None else "none" )
+        for member, result in zip( self.members, self.results ):
+            output += "\n  " + member["label"] + ": "
+            if result is None:
+                output += "failed"
+            elif result["nodes"] is None:
+                output += "cancelled"
+            else:
+                output += "{} after {} nodes in {:.3f}s".format( result["status"], result["nodes"], result["seconds"] )
+        return output
@@ -0,0 +1,48 @@
+import itertools
+
+"""
+    Restart schedules for randomized backtracking search.
+
+    A schedule is an endless sequence of cutoffs, each the number of
+    backtracks one run may make before the search starts over. The Luby
+    sequence (1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ...) times a unit is within a
+    log factor of the best fixed cutoff without knowing it in advance. The
+    geometric schedule multiplies the cutoff by a constant factor per run.
+"""
+
+LUBY = "luby"
+GEOMETRIC = "geometric"
+SCHEDULES = [ LUBY, GEOMETRIC ]
+
+# Backtracks allowed in the first run
+DEFAULT_UNIT = 100
+
+# Growth of the cutoff per run in the geometric schedule
+GEOMETRIC_FACTOR = 1.5
+
+# Returns the i-th term of the Luby sequence, counting from 1
+def luby ( i ):
+    k = 1
+    while True:
+        if i == ( 1 << k ) - 1:
+            return 1 << ( k - 1 )
+        if ( 1 << ( k - 1 ) ) <= i < ( 1 << k ) - 1:
+            i -= ( 1 << ( k - 1 ) ) - 1
+            k = 1
+        else:
+            k += 1
+
+# Yields the cutoff, in backtracks, of every run in turn
+def cutoffs ( schedule, unit = DEFAULT_UNIT ):
+    if schedule == LUBY:
+        for i in itertools.count( 1 ):
+            yield unit * luby( i )
+
+    elif schedule == GEOMETRIC:
+        cutoff = float( unit )
+        while True:
+            yield int( cutoff )
+            cutoff *= GEOMETRIC_FACTOR
+
+    else:
+        raise ValueError( "Unknown restart schedule: " + str(schedule) )
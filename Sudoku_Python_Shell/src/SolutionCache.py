@@ -0,0 +1,309 @@
+import collections
+import hashlib
+import itertools
+import math
+import os
+import SudokuBoard
+
+"""
+    Solution cache keyed by a symmetry-canonical form of the puzzle.
+
+    Two puzzles share a key when one becomes the other by relabeling the
+    values, permuting the rows within a band, the bands themselves, the
+    columns within a stack, the stacks themselves, or (on boards with
+    square blocks) transposing. A cached solution is mapped back through
+    the inverse of the puzzle's own symmetry before it is returned.
+
+    Entries live in an in-memory LRU and, optionally, in a directory on
+    disk that is trimmed, least recently used first, to a byte budget.
+"""
+
+# Puzzles whose invariants leave more orderings than this to compare are not cached
+MAX_CANDIDATES = 20000
+
+# ======================================================================
+# Canonical Form
+# ======================================================================
+
+"""
+    Returns (key, transform) for the board, or None when the board is too
+    symmetric to canonicalize within maxCandidates orderings.
+
+    Rows (and columns) are sorted by invariants that no symmetry changes:
+    the number of givens in the line, and the given counts of the crossing
+    lines it touches. Bands and stacks are sorted by the sorted invariants
+    of their lines. Only orderings that tie on these invariants are
+    compared. The key is the smallest row-major reading of the board
+    among them, after relabeling values in order of first appearance.
+"""
+def canonicalize ( sb, maxCandidates = MAX_CANDIDATES ):
+    p = sb.p
+    q = sb.q
+    grids = [ ( False, sb.board ) ]
+    if p == q:
+        grids.append( ( True, transpose( sb.board ) ) )
+
+    searches = []
+    total = 0
+    for transposed, grid in grids:
+        columns = transpose( grid )
+        rowCounts = [ sum( 1 for x in row if x ) for row in grid ]
+        colCounts = [ sum( 1 for x in col if x ) for col in columns ]
+        rowOrders = LineOrders( grid, colCounts, p )
+        colOrders = LineOrders( columns, rowCounts, q )
+        total += rowOrders.count * colOrders.count
+        searches.append( ( transposed, grid, rowOrders, colOrders ) )
+
+    if total > maxCandidates:
+        return None
+
+    best = None
+    for transposed, grid, rowOrders, colOrders in searches:
+        colOrderList = list( colOrders )
+        for rowOrder in rowOrders:
+            for colOrder in colOrderList:
+                cells, labels = relabel( grid, rowOrder, colOrder )
+                if best is None or cells < best[0]:
+                    best = ( cells, ( transposed, rowOrder, colOrder, labels ) )
+
+    key = str(p) + "x" + str(q) + ":" + ",".join( str( x ) for x in best[0] )
+    return ( key, best[1] )
+
+def transpose ( grid ):
+    return [ list( col ) for col in zip( *grid ) ]
+
+# Reads the grid in the given order, relabeling values by first appearance
+def relabel ( grid, rowOrder, colOrder, labels = None ):
+    labels = {} if labels is None else dict( labels )
+    cells = []
+    for r in rowOrder:
+        row = grid[r]
+        for c in colOrder:
+            v = row[c]
+            if v:
+                label = labels.get( v )
+                if label is None:
+                    label = labels[v] = len( labels ) + 1
+                cells.append( label )
+            else:
+                cells.append( 0 )
+    return tuple( cells ), labels
+
+"""
+    The orderings of a board's lines (rows, or columns read as rows) that
+    sort groups of size consecutive lines and the lines inside each group
+    by their invariants, with every ordering of tied entries included.
+"""
+class LineOrders:
+
+    def __init__ ( self, lines, crossingCounts, size ):
+        self.keys = [ ( sum( 1 for x in line if x ),
+                        tuple( sorted( crossingCounts[j] for j, x in enumerate( line ) if x ) ) )
+                      for line in lines ]
+        self.groups = [ list( range( g * size, ( g + 1 ) * size ) ) for g in range( len( lines ) // size ) ]
+        self.groupKeys = [ tuple( sorted( self.keys[i] for i in group ) ) for group in self.groups ]
+
+        self.count = tieCount( range( len( self.groups ) ), self.groupKeys.__getitem__ )
+        for group in self.groups:
+            self.count *= tieCount( group, self.keys.__getitem__ )
+
+    def __iter__ ( self ):
+        withinGroups = [ list( tiedOrders( group, self.keys.__getitem__ ) ) for group in self.groups ]
+        for groupOrder in tiedOrders( range( len( self.groups ) ), self.groupKeys.__getitem__ ):
+            for parts in itertools.product( *[ withinGroups[g] for g in groupOrder ] ):
+                yield [ i for part in parts for i in part ]
+
+# Items sorted by key, in every order that only reorders equal keys
+def tiedOrders ( items, key ):
+    ties = [ list( group ) for k, group in itertools.groupby( sorted( items, key = key ), key ) ]
+    for parts in itertools.product( *[ itertools.permutations( tie ) for tie in ties ] ):
+        yield [ i for part in parts for i in part ]
+
+def tieCount ( items, key ):
+    count = 1
+    for k, group in itertools.groupby( sorted( items, key = key ), key ):
+        count *= math.factorial( len( list( group ) ) )
+    return count
+
+# Moves a solution of the original board into canonical position and labels
+def toCanonical ( grid, transform ):
+    transposed, rowOrder, colOrder, labels = transform
+    if transposed:
+        grid = transpose( grid )
+    return relabel( grid, rowOrder, colOrder, labels )[0]
+
+# Moves a canonical solution back onto the original board
+def fromCanonical ( cells, transform, N ):
+    transposed, rowOrder, colOrder, labels = transform
+    inverse = { label : value for value, label in labels.items() }
+
+    # Values absent from the puzzle are interchangeable; pair them up in order
+    unused = [ v for v in range( 1, N + 1 ) if v not in labels ]
+    for k, value in enumerate( unused ):
+        inverse[len( labels ) + 1 + k] = value
+
+    grid = [ [ 0 ] * N for i in range( N ) ]
+    for i, r in enumerate( rowOrder ):
+        for j, c in enumerate( colOrder ):
+            grid[r][c] = inverse[cells[i * N + j]]
+
+    return transpose( grid ) if transposed else grid
+
+# ======================================================================
+# Cache
+# ======================================================================
+
+class SolutionCache:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, capacity = 1024, directory = None, maxBytes = 64 * 1024 * 1024 ):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.skipped = 0
+
+        self.diskBytes = 0
+        if directory is not None:
+            os.makedirs( directory, exist_ok = True )
+            for name in os.listdir( directory ):
+                self.diskBytes += os.path.getsize( os.path.join( directory, name ) )
+
+    # ==================================================================
+    # Lookups
+    # ==================================================================
+
+    """
+        Looks up a solution for the board.
+
+        Return: (status, SudokuBoard or None), where status is "hit",
+                "miss", or "skip" for boards that cannot be canonicalized
+    """
+    def lookup ( self, sb ):
+        canonical = canonicalize( sb )
+        if canonical is None:
+            self.skipped += 1
+            return ( "skip", None )
+
+        key, transform = canonical
+        cells = self.entries.get( key )
+        if cells is not None:
+            self.entries.move_to_end( key )
+        else:
+            cells = self.readDisk( key )
+            if cells is not None:
+                self.diskHits += 1
+                self.remember( key, cells )
+
+        if cells is None:
+            self.misses += 1
+            return ( "miss", None )
+
+        self.hits += 1
+        grid = fromCanonical( cells, transform, sb.N )
+        return ( "hit", SudokuBoard.SudokuBoard( sb.p, sb.q, board = grid ) )
+
+    # Stores the solution of a board under the board's canonical key
+    def store ( self, sb, solution ):
+        canonical = canonicalize( sb )
+        if canonical is None:
+            return
+
+        key, transform = canonical
+        cells = toCanonical( solution.board, transform )
+        self.remember( key, cells )
+        self.writeDisk( key, cells )
+
+    def remember ( self, key, cells ):
+        self.entries[key] = cells
+        self.entries.move_to_end( key )
+        while len( self.entries ) > self.capacity:
+            self.entries.popitem( last = False )
+
+    # ==================================================================
+    # Disk Store
+    # ==================================================================
+
+    def path ( self, key ):
+        return os.path.join( self.directory, hashlib.sha1( key.encode() ).hexdigest() )
+
+    def readDisk ( self, key ):
+        if self.directory is None:
+            return None
+
+        path = self.path( key )
+        try:
+            with open( path ) as f:
+                storedKey = f.readline().rstrip( "\n" )
+                cells = f.readline().split()
+        except OSError:
+            return None
+
+        if storedKey != key:
+            return None
+
+        # Reading counts as a use for eviction
+        os.utime( path )
+        return tuple( int( x ) for x in cells )
+
+    def writeDisk ( self, key, cells ):
+        if self.directory is None:
+            return
+
+        path = self.path( key )
+        if os.path.exists( path ):
+            return
+
+        data = key + "\n" + " ".join( str( x ) for x in cells ) + "\n"
+        temp = path + ".tmp" + str( os.getpid() )
+        with open( temp, "w" ) as f:
+            f.write( data )
+        os.replace( temp, path )
+        self.diskBytes += len( data )
+
+        if self.diskBytes > self.maxBytes:
+            self.evict()
+
+    # Deletes the least recently used files until the store fits its budget again
+    def evict ( self ):
+        files = []
+        for name in os.listdir( self.directory ):
+            path = os.path.join( self.directory, name )
+            try:
+                stat = os.stat( path )
+            except OSError:
+                continue
+            files.append( ( stat.st_mtime, stat.st_size, path ) )
+
+        files.sort()
+        self.diskBytes = sum( size for mtime, size, path in files )
+        target = self.maxBytes * 0.9
+        for mtime, size, path in files:
+            if self.diskBytes <= target:
+                break
+            try:
+                os.remove( path )
+            except OSError:
+                continue
+            self.diskBytes -= size
+
+    # ==================================================================
+    # Reporting
+    # ==================================================================
+
+    def hitRate ( self ):
+        lookups = self.hits + self.misses + self.skipped
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__ ( self ):
+        return ( "Cache Hits: " + str(self.hits) + " (" + str(self.diskHits) + " from disk)\n"
+               + "Cache Misses: " + str(self.misses) + "\n"
+               + "Cache Skipped: " + str(self.skipped) + "\n"
+               + "Cache Hit Rate: " + "{:.1%}".format( self.hitRate() ) )
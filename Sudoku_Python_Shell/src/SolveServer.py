@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import BTSolver
+import Budget
+import Labels
+import SudokuBoard
+import Trail
+
+"""
+    Long-running solve server, so clients pay interpreter and import
+    startup once instead of once per puzzle.
+
+    Clients connect over a local TCP port or a Unix socket and send one
+    request per line. Each request gets one response line that starts with
+    the request's sequence number on that connection (1, 2, ...). Responses
+    are sent as soon as each solve finishes, so they may arrive out of order.
+
+        SOLVE PUZZLE            one-line puzzle, N*N odometer characters
+        SOLVE p q PUZZLE        the same with an explicit block shape
+        SOLVE p q C1 C2 ...     N*N space separated odometer values
+        STATUS                  counters and latency percentiles as JSON
+        QUIT                    closes the connection
+
+        n SOLVED CELLS nodes=.. pushes=.. backtracks=.. seconds=..
+        n UNSAT nodes=.. pushes=.. backtracks=.. seconds=..
+        n TIMEOUT nodes=.. pushes=.. backtracks=.. seconds=..
+        n STATUS {...}
+        n ERROR message
+
+    A solved board comes back in the same form as the puzzle. Solves run
+    in a pool of worker processes. Accepted requests wait in a bounded
+    queue. When it is full, the server stops reading from the connection
+    until there is room, so a fast client is slowed down instead of
+    growing the server's memory. Every solve has a time limit, after
+    which it is answered with TIMEOUT.
+
+    Usage:
+        python3 SolveServer.py [MRV|MAD] [LCV] [FC|IFC|NOR|AC3]
+                               [--host 127.0.0.1] [--port 8765] [--unix PATH]
+                               [-j JOBS] [--queue 64] [--timeout 10]
+"""
+
+# Latencies kept for the percentiles in STATUS
+LATENCY_WINDOW = 10000
+
+# ======================================================================
+# Worker Process
+# ======================================================================
+
+"""
+    Solves one board in a worker process.
+
+    Return: a dictionary with the status ("SOLVED", "UNSAT" or "TIMEOUT"),
+            the solution's cells in row-major order (or None), and the
+            search stats
+"""
+def solveCells ( p, q, cells, config, timeout ):
+    start = time.perf_counter()
+    N = p*q
+    sudokudata = SudokuBoard.SudokuBoard( p, q, board = [ cells[i*N:(i+1)*N] for i in range( N ) ] )
+    trail = Trail.Trail()
+
+    solver = BTSolver.BTSolver( sudokudata, trail, config["val_sh"], config["var_sh"], config["cc"] )
+    if solver.checkConsistency():
+        if config["restarts"] != "":
+            solver.solveWithRestarts( config["restarts"], time_left = timeout )
+        else:
+            solver.solve( time_left = timeout )
+
+    # A board the initial propagation rejects is never searched
+    status = ( solver.status or Budget.UNSAT ).upper()
+    solution = None
+    if solver.hassolution:
+        solution = [ v for row in solver.getSolution().board for v in row ]
+
+    return {
+        "status": status,
+        "solution": solution,
+        "nodes": solver.nodes,
+        "pushes": trail.getPushCount(),
+        "backtracks": trail.getUndoCount(),
+        "seconds": time.perf_counter() - start,
+    }
+
+# ======================================================================
+# Protocol
+# ======================================================================
+
+"""
+    Parses the arguments of a SOLVE request.
+
+    Return: (p, q, cells, oneLine), where oneLine tells whether the puzzle
+            was sent as a single string of characters
+
+    Raises ValueError for malformed requests.
+"""
+def parseSolve ( tokens ):
+    if len( tokens ) == 1:
+        sb = SudokuBoard.parseLine( tokens[0] )
+        p, q, cells, oneLine = sb.p, sb.q, [ v for row in sb.board for v in row ], True
+    elif len( tokens ) >= 3:
+        p = int( tokens[0] )
+        q = int( tokens[1] )
+        if p < 1 or q < 1:
+            raise ValueError( "p and q must be positive" )
+        oneLine = len( tokens ) == 3
+        cells = [ SudokuBoard.CELL_VALUES[c] for c in ( tokens[2] if oneLine else tokens[2:] ) ]
+    else:
+        raise ValueError( "SOLVE expects PUZZLE, p q PUZZLE, or p q and N*N values" )
+
+    N = p*q
+    if len( cells ) != N*N:
+        raise ValueError( "A " + str(p) + "x" + str(q) + " puzzle has " + str(N*N) + " cells, not " + str(len(cells)) )
+    if any( v > N for v in cells ):
+        raise ValueError( "Values must be between 0 and " + str(N) )
+
+    return ( p, q, cells, oneLine )
+
+# Writes the cells back in the form the puzzle was sent in
+def formatCells ( p, q, cells, oneLine ):
+    N = p*q
+    sb = SudokuBoard.SudokuBoard( p, q, board = [ cells[i*N:(i+1)*N] for i in range( N ) ] )
+    separator = "" if oneLine else " "
+    return separator.join( sb.intToOdometer( v ) for v in cells )
+
+def formatResult ( p, q, result, oneLine ):
+    stats = "nodes={} pushes={} backtracks={} seconds={:.6f}".format(
+            result["nodes"], result["pushes"], result["backtracks"], result["seconds"] )
+    if result["status"] == "SOLVED":
+        return "SOLVED " + formatCells( p, q, result["solution"], oneLine ) + " " + stats
+    return result["status"] + " " + stats
+
+# ======================================================================
+# Server
+# ======================================================================
+
+class SolveServer:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, config, jobs, queueSize, timeout ):
+        self.config = config
+        self.jobs = jobs
+        self.timeout = timeout
+        self.queue = asyncio.Queue( maxsize = queueSize )
+
+        # Forked workers would inherit the client sockets open at the time
+        # and keep those connections alive after the server closes them
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context( "forkserver" )
+        else:
+            context = multiprocessing.get_context()
+        self.pool = concurrent.futures.ProcessPoolExecutor( max_workers = jobs, mp_context = context )
+
+        self.started = time.monotonic()
+        self.inFlight = 0
+        self.connections = 0
+        self.counts = collections.Counter()
+        self.latencies = collections.deque( maxlen = LATENCY_WINDOW )
+
+    # ==================================================================
+    # Dispatch
+    # ==================================================================
+
+    # Runs queued solves on the pool, one at a time per worker process
+    async def dispatch ( self ):
+        loop = asyncio.get_running_loop()
+        while True:
+            p, q, cells, future = await self.queue.get()
+
+            # The connection closed before the request reached a worker
+            if future.cancelled():
+                self.queue.task_done()
+                continue
+
+            self.inFlight += 1
+            try:
+                # The solver stops itself at the timeout; the grace period
+                # covers building the network and process overhead
+                result = await asyncio.wait_for(
+                    loop.run_in_executor( self.pool, solveCells, p, q, cells, self.config, self.timeout ),
+                    self.timeout + 5 )
+            except asyncio.TimeoutError:
+                result = { "status": "TIMEOUT", "solution": None, "nodes": 0, "pushes": 0,
+                           "backtracks": 0, "seconds": self.timeout }
+            except Exception as e:
+                result = e
+            finally:
+                self.inFlight -= 1
+                self.queue.task_done()
+
+            if not future.cancelled():
+                if isinstance( result, Exception ):
+                    future.set_exception( result )
+                else:
+                    future.set_result( result )
+
+    # ==================================================================
+    # Connections
+    # ==================================================================
+
+    async def handleConnection ( self, reader, writer ):
+        self.connections += 1
+        pending = set()
+        seq = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                tokens = line.decode( "utf-8", "replace" ).split()
+                if not tokens:
+                    continue
+                seq += 1
+
+                command = tokens[0].upper()
+                if command == "QUIT":
+                    break
+
+                if command == "STATUS":
+                    self.respond( writer, seq, "STATUS " + json.dumps( self.status() ) )
+                    await writer.drain()
+                    continue
+
+                if command != "SOLVE":
+                    self.counts["ERROR"] += 1
+                    self.respond( writer, seq, "ERROR unknown command " + tokens[0] )
+                    await writer.drain()
+                    continue
+
+                try:
+                    p, q, cells, oneLine = parseSolve( tokens[1:] )
+                except ValueError as e:
+                    self.counts["ERROR"] += 1
+                    self.respond( writer, seq, "ERROR " + str(e) )
+                    await writer.drain()
+                    continue
+
+                # Waits here while the queue is full, which stops reading this connection
+                future = asyncio.get_running_loop().create_future()
+                received = time.monotonic()
+                await self.queue.put( ( p, q, cells, future ) )
+
+                task = asyncio.ensure_future( self.answer( writer, seq, p, q, future, oneLine, received ) )
+                pending.add( task )
+                task.add_done_callback( pending.discard )
+
+            if pending:
+                await asyncio.wait( pending )
+        except ConnectionError:
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+
+    async def answer ( self, writer, seq, p, q, future, oneLine, received ):
+        try:
+            result = await future
+        except Exception as e:
+            self.counts["ERROR"] += 1
+            self.respond( writer, seq, "ERROR " + type(e).__name__ + ": " + str(e) )
+        else:
+            self.counts[result["status"]] += 1
+            self.latencies.append( time.monotonic() - received )
+            self.respond( writer, seq, formatResult( p, q, result, oneLine ) )
+        await writer.drain()
+
+    def respond ( self, writer, seq, text ):
+        writer.write( ( str(seq) + " " + text + "\n" ).encode() )
+
+    # ==================================================================
+    # Status
+    # ==================================================================
+
+    def percentiles ( self ):
+        latencies = sorted( self.latencies )
+        if not latencies:
+            return { "p50": None, "p90": None, "p99": None, "max": None }
+
+        def at ( fraction ):
+            return latencies[min( len( latencies ) - 1, int( fraction * len( latencies ) ) )]
+
+        return { "p50": at( 0.50 ), "p90": at( 0.90 ), "p99": at( 0.99 ), "max": latencies[-1] }
+
+    def status ( self ):
+        return {
+            "uptime": time.monotonic() - self.started,
+            "workers": self.jobs,
+            "connections": self.connections,
+            "queued": self.queue.qsize(),
+            "queueSize": self.queue.maxsize,
+            "inFlight": self.inFlight,
+            "solved": self.counts["SOLVED"],
+            "unsat": self.counts["UNSAT"],
+            "timeout": self.counts["TIMEOUT"],
+            "errors": self.counts["ERROR"],
+            "latency": self.percentiles(),
+        }
+
+    # ==================================================================
+    # Running
+    # ==================================================================
+
+    async def serve ( self, host, port, unixPath ):
+        # Starts the workers now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather( *[ loop.run_in_executor( self.pool, int ) for i in range( self.jobs ) ] )
+
+        dispatchers = [ asyncio.ensure_future( self.dispatch() ) for i in range( self.jobs ) ]
+        if unixPath:
+            server = await asyncio.start_unix_server( self.handleConnection, path = unixPath )
+            print( "Listening on " + unixPath, flush = True )
+        else:
+            server = await asyncio.start_server( self.handleConnection, host, port )
+            print( "Listening on " + host + ":" + str(server.sockets[0].getsockname()[1]), flush = True )
+
+        # Closing the server on SIGTERM ends serve_forever, so the cleanup below runs
+        loop.add_signal_handler( signal.SIGTERM, server.close )
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            self.pool.shutdown( wait = False )
+            if unixPath and os.path.exists( unixPath ):
+                os.remove( unixPath )
+
+def main ( ):
+    parser = argparse.ArgumentParser( description = "Serve Sudoku solves over a local line protocol." )
+    parser.add_argument( "heuristics", nargs = "*", default = [ "MRV", "NOR" ], help = "e.g. MRV NOR, MAD LCV AC3 or MRV FC LUBY" )
+    parser.add_argument( "--host", default = "127.0.0.1" )
+    parser.add_argument( "--port", type = int, default = 8765, help = "TCP port, 0 for any free port" )
+    parser.add_argument( "--unix", default = "", help = "listen on this Unix socket instead of TCP" )
+    parser.add_argument( "-j", "--jobs", type = int, default = 0, help = "worker processes, 0 for one per CPU" )
+    parser.add_argument( "--queue", type = int, default = 64, help = "requests waiting for a worker before reading pauses" )
+    parser.add_argument( "--timeout", type = float, default = 10, help = "seconds per solve" )
+    args = parser.parse_args()
+
+    try:
+        config = Labels.parseMember( "+".join( args.heuristics ), engines = False )
+    except ValueError as e:
+        parser.error( str( e ) )
+
+    jobs = args.jobs if args.jobs > 0 else ( os.cpu_count() or 1 )
+    server = SolveServer( config, jobs, max( 1, args.queue ), args.timeout )
+    try:
+        asyncio.run( server.serve( args.host, args.port, args.unix ) )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
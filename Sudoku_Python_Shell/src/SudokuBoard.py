@@ -1,5 +1,9 @@
+import collections
 import itertools
+import math
+import mmap
 import random
+import re
 import Constraint
 import Variable
 
@@ -41,10 +45,7 @@ class SudokuBoard:
 
                 self.board = []
                 for i in range(1, len(lines)):
-                    tempLine = []
-                    for n in lines[i].split():
-                        tempLine.append(self.odometerToInt(n))
-                    self.board.append(tempLine)
+                    self.board.append( [ CELL_VALUES[n] for n in lines[i].split() ] )
 
         else:
             if m == None:
@@ -136,3 +137,151 @@ class SudokuBoard:
 
         except:
             return 0
+
+
+# ======================================================================
+# Streaming Input
+# ======================================================================
+
+# Value of every one and two character odometer token, anything else reads as 0
+def cellTable ( key ):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    table = collections.defaultdict( int )
+    for token in itertools.chain( digits, ( a + b for a in digits for b in digits ) ):
+        table[key( token )] = int( token, 36 )
+    return table
+
+CELL_VALUES = cellTable( str )
+CELL_BYTES = cellTable( str.encode )
+
+# Whitespace and comment lines between boards
+GAP = re.compile( rb"(?:\s+|#[^\n]*)*" )
+
+# Patterns matching the next n non-blank lines (the rows of a board), by n
+ROW_PATTERNS = dict()
+
+def rowPattern ( n ):
+    pattern = ROW_PATTERNS.get( n )
+    if pattern is None:
+        pattern = ROW_PATTERNS[n] = re.compile( rb"(?:\s*\S[^\n]*(?![^\n])){%d}" % n )
+    return pattern
+
+"""
+    Lazily reads boards from an open text stream (a file or sys.stdin),
+    yielding one SudokuBoard at a time. Two formats are accepted and may be
+    mixed in the same stream:
+
+    - the board file format: a "p q" line followed by p*q rows of
+      odometer values
+    - one puzzle per line: N*N odometer characters with '0' or '.' for
+      blanks, e.g. 81 characters for a 9x9 board
+
+    Blank lines and lines starting with '#' are skipped, and a header or
+    puzzle line may end with a '#' comment.
+"""
+def readBoards ( stream ):
+    lines = iter( stream )
+    for line in lines:
+        header = parseHeader( line )
+        if header is None:
+            continue
+        if isinstance( header, SudokuBoard ):
+            yield header
+            continue
+
+        p, q = header
+        N = p*q
+
+        board = []
+        while len( board ) < N:
+            row = next( lines, None )
+            if row is None:
+                raise ValueError( "Board ended after " + str(len(board)) + " of " + str(N) + " rows" )
+            row = row.split()
+            if row:
+                board.append( [ odometerToInt( n ) for n in row ] )
+
+        yield SudokuBoard( p, q, board = board )
+
+"""
+    Reads the same formats as readBoards from a file path, parsing straight
+    out of a memory map of the file. Each board's rows are matched by one
+    regular expression and split in one call, then looked up in a table,
+    so there are no per-line copies and no int() call per cell.
+"""
+def mapBoards ( path ):
+    with open( path, "rb" ) as f:
+        if f.seek( 0, 2 ) == 0:
+            return
+        buffer = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+
+    with buffer:
+        pos = 0
+        end = len( buffer )
+        while True:
+            pos = GAP.match( buffer, pos ).end()
+            if pos >= end:
+                return
+
+            start = pos
+            pos = buffer.find( b"\n", start )
+            if pos < 0:
+                pos = end
+
+            header = parseHeader( buffer[start:pos].decode() )
+            if isinstance( header, SudokuBoard ):
+                yield header
+                continue
+
+            p, q = header
+            N = p*q
+
+            rows = rowPattern( N ).match( buffer, pos )
+            if rows is None:
+                raise ValueError( "Board at byte " + str(start) + " has fewer than " + str(N) + " rows" )
+            pos = rows.end()
+
+            values = list( map( CELL_BYTES.__getitem__, rows.group().split() ) )
+            if len( values ) != N*N:
+                raise ValueError( "Board at byte " + str(start) + " has " + str(len(values)) + " cells instead of " + str(N*N) )
+            yield SudokuBoard( p, q, board = [ values[i*N:(i+1)*N] for i in range( N ) ] )
+
+"""
+    Parses the line that starts a board, for both readers. Anything after
+    a '#' is a comment. A token alone on the line is a one-line puzzle and
+    is returned as a SudokuBoard; two tokens are a "p q" header and are
+    returned as the tuple (p, q). A blank or comment line gives None.
+"""
+def parseHeader ( line ):
+    tokens = line.split( "#", 1 )[0].split()
+    if not tokens:
+        return None
+
+    if len( tokens ) == 1:
+        return parseLine( tokens[0] )
+
+    if len( tokens ) != 2:
+        raise ValueError( "Board header " + repr(line.strip()) + " is not \"p q\"" )
+    return ( int( float( tokens[0] ) ), int( float( tokens[1] ) ) )
+
+# Builds a board from the one-line format, picking the block shape closest to square
+def parseLine ( line ):
+    N = int( round( math.sqrt( len( line ) ) ) )
+    if N*N != len( line ):
+        raise ValueError( "Puzzle line of length " + str(len(line)) + " is not a square board" )
+
+    p = int( math.sqrt( N ) )
+    while N % p != 0:
+        p -= 1
+    q = N // p
+
+    cells = [ CELL_VALUES[c] for c in line ]
+    board = [ cells[i*N:(i+1)*N] for i in range( N ) ]
+    return SudokuBoard( p, q, board = board )
+
+def odometerToInt ( s ):
+    try:
+        return int( s, 36 )
+
+    except:
+        return 0
@@ -1,10 +1,12 @@
-# import copy
-import Variable
-import Domain
-import copy
+import array
+import struct
 
 """
     Represents the trail of changes made. This allows backtracking to occur.
+
+    Each entry records only a variable and the bits of its domain before the
+    change. Entries live in preallocated storage that doubles when full, so
+    pushing does not allocate in the common case.
 """
 
 class Trail:
@@ -12,15 +14,24 @@ class Trail:
     # ==================================================================
     # Properties
     # ==================================================================
-    numPush = 0
-    numUndo = 0
+    INITIAL_CAPACITY = 1024
+
+    # Bytes used by one entry: a domain state plus a variable reference
+    ENTRY_SIZE = array.array( 'Q' ).itemsize + struct.calcsize( 'P' )
 
     # ==================================================================
     # Constructor
     # ==================================================================
 
-    def __init__ ( self ):
-        self.trailStack  = []
+    def __init__ ( self, capacity = INITIAL_CAPACITY ):
+        self.numPush = 0
+        self.numUndo = 0
+
+        self.capacity    = capacity
+        self.trailVars   = [ None ] * capacity
+        self.trailStates = array.array( 'Q', bytes( 8 * capacity ) )
+        self.top         = 0
+        self.peak        = 0
         self.trailMarker = []
 
     # ==================================================================
@@ -28,13 +39,21 @@ class Trail:
     # ==================================================================
 
     def size ( self ):
-        return len( self.trailStack )
+        return self.top
 
     def getPushCount ( self ):
-        return Trail.numPush
+        return self.numPush
 
     def getUndoCount ( self ):
-        return Trail.numUndo
+        return self.numUndo
+
+    # Returns the largest number of entries the trail has held at once
+    def getPeakSize ( self ):
+        return self.peak
+
+    # Returns the memory used by the trail entries at their peak, in bytes
+    def getPeakBytes ( self ):
+        return self.peak * Trail.ENTRY_SIZE
 
     # ==================================================================
     # Modifiers
@@ -42,7 +61,7 @@ class Trail:
 
     # Places a marker in the trail
     def placeTrailMarker ( self ):
-        self.trailMarker.append( len( self.trailStack ) )
+        self.trailMarker.append( self.top )
 
     """
         Before you assign a variable in constraint propagation,
@@ -51,25 +70,38 @@ class Trail:
         you can restore propagated domains correctly.
     """
     def push ( self, v ):
-        Trail.numPush += 1
-        domainCopy = Domain.Domain( [i for i in v.getValues()] )
-        vPair = [v, domainCopy]
-        self.trailStack.append(vPair)
+        self.numPush += 1
+        top = self.top
+        if top == self.capacity:
+            self.grow()
+
+        self.trailVars[top] = v
+        self.trailStates[top] = v.domain.bits
+        top += 1
+        self.top = top
+        if top > self.peak:
+            self.peak = top
 
     # Pops and restores variables on the trail until the last trail marker
     def undo ( self ):
-        Trail.numUndo += 1
+        self.numUndo += 1
         targetSize = self.trailMarker.pop() # targetSize target position on the trail to backtrack to
-        size = len(self.trailStack)
-        while size > targetSize:
-            vPair = self.trailStack.pop()
-            v = vPair[0]
-            v.setDomain( vPair[1] )
-            v.setModified( False )
-            v.unassign()
-            size -= 1
+        trailVars = self.trailVars
+        trailStates = self.trailStates
+        for i in range( self.top - 1, targetSize - 1, -1 ):
+            trailVars[i].restoreDomain( trailStates[i] )
+            trailVars[i] = None
+        self.top = targetSize
 
     # Clears the trail
     def clear ( self ):
-        self.trailStack = []
+        for i in range( self.top ):
+            self.trailVars[i] = None
+        self.top = 0
         self.trailMarker = []
+
+    # Doubles the storage once every slot is in use
+    def grow ( self ):
+        self.trailVars.extend( [ None ] * self.capacity )
+        self.trailStates.frombytes( bytes( 8 * self.capacity ) )
+        self.capacity *= 2
@@ -3,25 +3,31 @@ import Domain
 
 """
     Represents a variable in a CSP
-"""
 
-STATIC_NAMING_COUNTER = 1
+    Variables are slotted, and ConstraintNetwork.addVariable gives each one
+    a dense integer id (its position in the network, or -1 before it is
+    added) that the network and the solver index their tables by.
+"""
 
 class Variable:
 
+    __slots__ = ( "id", "domain", "row", "col", "block", "listeners", "assigned", "modified", "changeable" )
+
     # ==================================================================
     # Constructors
     # ==================================================================
 
     def __init__ ( self, possible_Values, row, col, block ):
-        global STATIC_NAMING_COUNTER
-        self.name = "v" + str(STATIC_NAMING_COUNTER)
-        STATIC_NAMING_COUNTER += 1
+        self.id = -1
 
         self.domain = Domain.Domain( possible_Values )
         self.row = row
         self.col = col
         self.block = block
+
+        # Objects told about every domain or assignment change, see notifyListeners
+        self.listeners = []
+
         if self.size() == 1:
             self.assigned = True
             self.modified = True
@@ -37,7 +43,7 @@ class Variable:
         self.col = v.col
         self.block = v.block
         self.modified = v.modified
-        self.name = v.name
+        self.id = v.id
 
     # ==================================================================
     # Accessors
@@ -60,11 +66,17 @@ class Variable:
         if not self.isAssigned():
             return 0
         else:
-            return self.domain.values[0]
+            bits = self.domain.bits
+            return ( bits & -bits ).bit_length() - 1
 
     def getDomain ( self ):
         return self.domain
 
+    # Names are derived from the id, so they are v1, v2, ... within a network
+    @property
+    def name ( self ):
+        return "v" + str(self.id + 1)
+
     def getName ( self ):
         return self.name
 
@@ -80,15 +92,23 @@ class Variable:
         self.domain.modified = mod
 
     def unassign(self):
+        wasAssigned = self.assigned
         self.assigned = False
+        if wasAssigned and self.listeners:
+            self.notifyListeners( self.domain.bits, True )
 
     # Assign a value to the variable
     def assignValue ( self, val ):
         if not self.changeable:
             return
 
+        oldBits = self.domain.bits
+        wasAssigned = self.assigned
         self.assigned = True
-        self.setDomain( Domain.Domain( val ) )
+        self.domain.assign( val )
+        self.modified = True
+        if self.listeners:
+            self.notifyListeners( oldBits, wasAssigned )
 
     # Sets the domain of the variable
     def setDomain ( self, d ):
@@ -96,17 +116,43 @@ class Variable:
             return
 
         if self.domain != d:
+            oldBits = self.domain.bits
             self.domain = d
             self.modified = True
+            if self.listeners:
+                self.notifyListeners( oldBits, self.assigned )
+
+    # Restores a domain state saved on the trail and unassigns the variable
+    def restoreDomain ( self, bits ):
+        if not self.changeable:
+            return
+
+        oldBits = self.domain.bits
+        wasAssigned = self.assigned
+        self.domain.bits = bits
+        self.setModified( False )
+        self.assigned = False
+        if self.listeners:
+            self.notifyListeners( oldBits, wasAssigned )
 
     # Removes a value from the domain
     def removeValueFromDomain ( self, val ):
         if not self.changeable:
             return
 
-        self.domain.remove( val )
+        if self.domain.remove( val ) and self.listeners:
+            self.notifyListeners( self.domain.bits | ( 1 << val ), self.assigned )
         self.modified = self.domain.isModified()
 
+    """
+        Calls variableChanged( v, oldBits, wasAssigned ) on every listener
+        after the domain or the assigned flag of this variable changed.
+        Listeners read the new state from the variable itself.
+    """
+    def notifyListeners ( self, oldBits, wasAssigned ):
+        for listener in self.listeners:
+            listener.variableChanged( self, oldBits, wasAssigned )
+
     # ==================================================================
     # String representation
     # ==================================================================
@@ -0,0 +1,274 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname( os.path.abspath( __file__ ) )
+sys.path.insert( 0, os.path.join( HERE, "..", "src" ) )
+
+import BTSolver
+import Budget
+import DLXSolver
+import Labels
+import Main
+import NumpySolver
+import SolutionCache
+import SudokuBoard
+import Trail
+
+"""
+    Tests for the solver engines: every engine and check returns a valid
+    solution, solution counts agree with Dancing Links, a board the root
+    propagation rejects is unsatisfiable, the solution cache answers for
+    symmetric puzzles, and budgets stop a search where they should.
+
+    Usage (from Sudoku_Python_Shell):
+        python3 -m pytest tests
+"""
+
+# ======================================================================
+# Boards
+# ======================================================================
+
+EASY = [ [ 0, 0, 3, 0, 2, 0, 6, 0, 0 ],
+         [ 9, 0, 0, 3, 0, 5, 0, 0, 1 ],
+         [ 0, 0, 1, 8, 0, 6, 4, 0, 0 ],
+         [ 0, 0, 8, 1, 0, 2, 9, 0, 0 ],
+         [ 7, 0, 0, 0, 0, 0, 0, 0, 8 ],
+         [ 0, 0, 6, 7, 0, 8, 2, 0, 0 ],
+         [ 0, 0, 2, 6, 0, 9, 5, 0, 0 ],
+         [ 8, 0, 0, 2, 0, 3, 0, 0, 9 ],
+         [ 0, 0, 5, 0, 1, 0, 3, 0, 0 ] ]
+
+# Cell (0, 0) sees 1-4 in its row, 5-8 in its column and 9 in its block
+WIPE_OUT = [ [ 0, 0, 0, 1, 2, 3, 4, 0, 0 ],
+             [ 0, 9, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 5, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 6, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 7, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 8, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ],
+             [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ] ]
+
+# Unsatisfiable, though arc consistency at the root does not show it
+UNSAT_4 = [ [ 0, 0, 1, 0 ],
+            [ 4, 0, 0, 0 ],
+            [ 0, 1, 0, 4 ],
+            [ 0, 0, 0, 0 ] ]
+
+# The solution's first seven rows: the last two rows can be filled 8 ways
+AMBIGUOUS = [ [ 4, 8, 3, 9, 2, 1, 6, 5, 7 ],
+              [ 9, 6, 7, 3, 4, 5, 8, 2, 1 ],
+              [ 2, 5, 1, 8, 7, 6, 4, 9, 3 ],
+              [ 5, 4, 8, 1, 3, 2, 9, 7, 6 ],
+              [ 7, 2, 9, 5, 6, 4, 1, 3, 8 ],
+              [ 1, 3, 6, 7, 9, 8, 2, 4, 5 ],
+              [ 3, 7, 2, 6, 8, 9, 5, 1, 4 ],
+              [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ],
+              [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ] ]
+
+# Blocks of 2 rows by 3 columns
+RECT_6 = [ [ 4, 1, 5, 3, 0, 0 ],
+           [ 3, 0, 0, 0, 0, 5 ],
+           [ 2, 0, 0, 5, 0, 0 ],
+           [ 0, 0, 0, 2, 0, 0 ],
+           [ 0, 0, 0, 1, 2, 0 ],
+           [ 1, 2, 0, 6, 0, 0 ] ]
+
+def board ( p, q, rows ):
+    return SudokuBoard.SudokuBoard( p, q, board = [ row[:] for row in rows ] )
+
+def easy ( ):
+    return board( 3, 3, EASY )
+
+def ambiguous ( ):
+    return board( 3, 3, AMBIGUOUS )
+
+def empty ( p, q ):
+    return board( p, q, [ [ 0 ] * ( p*q ) ] * ( p*q ) )
+
+# Whether solution fills puzzle, keeps its givens, and repeats no value in a unit
+def isSolution ( puzzle, solution ):
+    p, q, N = puzzle.p, puzzle.q, puzzle.N
+    grid = solution.board
+    full = set( range( 1, N + 1 ) )
+    for r in range( N ):
+        for c in range( N ):
+            if puzzle.board[r][c] != 0 and grid[r][c] != puzzle.board[r][c]:
+                return False
+
+    rows = [ set( grid[r] ) for r in range( N ) ]
+    cols = [ set( grid[r][c] for r in range( N ) ) for c in range( N ) ]
+    blocks = [ set( grid[r][c] for r in range( br, br + p ) for c in range( bc, bc + q ) )
+               for br in range( 0, N, p ) for bc in range( 0, N, q ) ]
+    return all( unit == full for unit in rows + cols + blocks )
+
+# Joins option names into a label, leaving out the ones not set
+def label ( *names ):
+    return "+".join( name for name in names if name != "" )
+
+# A backtracking solver configured by a label, plain backtracking for ""
+def btSolver ( sb, name ):
+    member = Labels.parseMember( name, engines = False ) if name != "" else { "val_sh": "", "var_sh": "", "cc": "" }
+    return BTSolver.BTSolver( sb, Trail.Trail(), member["val_sh"], member["var_sh"], member["cc"] )
+
+# ======================================================================
+# Engines
+# ======================================================================
+
+CHECK_LABELS = [ "" ] + list( Labels.CONSISTENCY_CHECKS )
+BT_LABELS = [ label( var, val, cc )
+              for var in [ "" ] + list( Labels.VAR_HEURISTICS )
+              for val in [ "" ] + list( Labels.VAL_HEURISTICS )
+              for cc in CHECK_LABELS ]
+
+def engines ( ):
+    yield DLXSolver.DLXSolver
+    if NumpySolver.NumpySolver.available():
+        yield NumpySolver.NumpySolver
+
+# Without a check no domain shrinks and MAD ties on degree alone, which can
+# take millions of nodes on 9x9; those combinations run on 6x6 only
+@pytest.mark.parametrize( "name", BT_LABELS, ids = [ name or "BT" for name in BT_LABELS ] )
+@pytest.mark.parametrize( "p, q, rows", [ ( 3, 3, EASY ), ( 2, 3, RECT_6 ) ], ids = [ "9x9", "6x6" ] )
+def test_backtracking_returns_a_valid_solution ( name, p, q, rows ):
+    if p*q > 6 and not any( cc in name.split( "+" ) for cc in Labels.CONSISTENCY_CHECKS ):
+        pytest.skip( "no consistency check" )
+    sb = board( p, q, rows )
+    solver = btSolver( sb, name )
+    assert solver.solve() == 0
+    assert solver.status == Budget.SOLVED
+    assert isSolution( sb, solver.getSolution() )
+
+@pytest.mark.parametrize( "engine", list( engines() ), ids = lambda e: e.__name__ )
+@pytest.mark.parametrize( "make", [ easy, lambda: board( 2, 3, RECT_6 ) ], ids = [ "9x9", "6x6" ] )
+def test_engine_returns_a_valid_solution ( engine, make ):
+    sb = make()
+    solver = engine( sb )
+    assert solver.solve() == 0
+    assert solver.status == Budget.SOLVED
+    assert isSolution( sb, solver.getSolution() )
+
+@pytest.mark.parametrize( "name", [ "MRV+FC+LUBY", "MAD+NOR+GEOM" ] )
+def test_restarts_return_a_valid_solution ( name ):
+    sb = easy()
+    member = Labels.parseMember( name, engines = False )
+    solver = btSolver( sb, name.rsplit( "+", 1 )[0] )
+    assert solver.solveWithRestarts( member["restarts"], seed = 1 ) == 0
+    assert isSolution( sb, solver.getSolution() )
+
+# ======================================================================
+# Solution Counts
+# ======================================================================
+
+@pytest.mark.parametrize( "cc", CHECK_LABELS, ids = [ cc or "none" for cc in CHECK_LABELS ] )
+@pytest.mark.parametrize( "make", [ easy, ambiguous, lambda: board( 2, 2, UNSAT_4 ) ],
+                          ids = [ "unique", "ambiguous", "unsat" ] )
+def test_count_agrees_with_dlx ( cc, make ):
+    found = [ solution.board for solution in btSolver( make(), label( "MRV", cc ) ).solutions() ]
+    count = btSolver( make(), label( "MRV", cc ) ).countSolutions( limit = len( found ) + 1 )
+    assert count == len( found )
+
+    dlx = DLXSolver.DLXSolver( make() )
+    dlx.solve()
+    if count == 0:
+        assert dlx.status == Budget.UNSAT
+    else:
+        assert dlx.status == Budget.SOLVED
+        assert dlx.getSolution().board in found
+    assert count == { easy: 1, ambiguous: 8 }.get( make, 0 )
+
+# ======================================================================
+# Root Propagation
+# ======================================================================
+
+@pytest.mark.parametrize( "cc", [ "FC", "IFC", "NOR", "AC3" ] )
+def test_root_wipe_out_is_unsat ( cc ):
+    # Searching the board instead would take far more than the node limit
+    solver = btSolver( board( 3, 3, WIPE_OUT ), "MRV+" + cc )
+    assert solver.solve( node_limit = 1000 ) == 0
+    assert solver.status == Budget.UNSAT
+    assert solver.nodes == 0
+
+    solver = btSolver( board( 3, 3, WIPE_OUT ), "MRV+" + cc )
+    assert solver.countSolutions( node_limit = 1000 ) == 0
+    assert solver.status == Budget.UNSAT
+
+@pytest.mark.parametrize( "count", [ 0, 2 ] )
+def test_run_solver_reports_root_wipe_out ( count ):
+    config = { "portfolio": [], "engine": "", "val_sh": "", "var_sh": "MinimumRemainingValue",
+               "cc": "arcConsistency", "stats": False, "statsJson": "", "count": count,
+               "restarts": "", "seed": None }
+    solver = Main.runSolver( board( 3, 3, WIPE_OUT ), Trail.Trail(), config )
+    assert solver.status == Budget.UNSAT
+    assert not solver.hassolution
+    if count > 0:
+        assert solver.solutionCount == 0
+
+# ======================================================================
+# Solution Cache
+# ======================================================================
+
+# Relabels the values, swaps two rows of the first band and swaps the first and last stacks
+def transform ( sb ):
+    p, q, N = sb.p, sb.q, sb.N
+    labels = [ 0 ] + [ ( v % N ) + 1 for v in range( 1, N + 1 ) ]
+    rows = [ 1, 0 ] + list( range( 2, N ) )
+    stacks = list( range( N - q, N ) ) + list( range( q, N - q ) ) + list( range( 0, q ) )
+    grid = [ [ labels[sb.board[r][c]] for c in stacks ] for r in rows ]
+    return SudokuBoard.SudokuBoard( p, q, board = grid )
+
+def test_cache_round_trips_through_a_symmetry ( tmp_path ):
+    sb = easy()
+    solver = DLXSolver.DLXSolver( sb )
+    solver.solve()
+    solution = solver.getSolution()
+
+    cache = SolutionCache.SolutionCache( directory = str( tmp_path ) )
+    cache.store( sb, solution )
+
+    status, cached = cache.lookup( transform( sb ) )
+    assert status == "hit"
+    assert cached.board == transform( solution ).board
+    assert isSolution( transform( sb ), cached )
+
+    # A fresh cache finds the same entry on disk
+    status, cached = SolutionCache.SolutionCache( directory = str( tmp_path ) ).lookup( transform( sb ) )
+    assert status == "hit"
+    assert cached.board == transform( solution ).board
+
+# ======================================================================
+# Budgets
+# ======================================================================
+
+SOLVERS = [ ( "BT", lambda sb: btSolver( sb, "MRV+FC" ) ) ] + \
+          [ ( engine.__name__, engine ) for engine in engines() ]
+
+@pytest.mark.parametrize( "make", [ make for name, make in SOLVERS ], ids = [ name for name, make in SOLVERS ] )
+@pytest.mark.parametrize( "limit", [ 1, 5, 40 ] )
+def test_budget_stops_at_the_node_limit ( make, limit ):
+    solver = make( empty( 3, 3 ) )
+    assert solver.solve( node_limit = limit ) == -1
+    assert solver.status == Budget.TIMEOUT
+    assert solver.nodes == limit
+
+@pytest.mark.parametrize( "make", [ make for name, make in SOLVERS ], ids = [ name for name, make in SOLVERS ] )
+def test_budget_stops_on_cancellation ( make ):
+    budget = Budget.Budget()
+    budget.cancel()
+    solver = make( empty( 3, 3 ) )
+    assert solver.solve( budget = budget ) == -1
+    assert solver.status == Budget.CANCELLED
+    assert solver.nodes == 0
+
+def test_cancellation_during_enumeration ( ):
+    budget = Budget.Budget( checkEvery = 1 )
+    solver = btSolver( empty( 2, 2 ), "MRV+FC" )
+    found = 0
+    for solution in solver.solutions( budget = budget ):
+        found += 1
+        if found == 3:
+            budget.cancel()
+    assert found == 3
+    assert solver.status == Budget.CANCELLED